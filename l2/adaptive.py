@@ -0,0 +1,134 @@
+"""
+Локальная (адаптивная) пороговая обработка: среднее, Ниблэк, Саувола.
+
+Среднее и дисперсия по окну берутся из интегральных изображений (таблиц
+сумм): сумма по любому прямоугольнику - 4 обращения к таблице. Поэтому
+время работы не зависит от размера окна.
+
+Порог свой для каждого пикселя T(x,y); как и в глобальных методах,
+пиксель > T становится 255, иначе 0.
+"""
+import numpy as np
+
+from buffers import default_pool
+from lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+
+def _to_gray(image, pool):
+    if len(image.shape) == 3:
+        gray = pool.acquire(image.shape[:2], np.uint8)
+        cv2.cvtColor(image, cv2.COLOR_RGB2GRAY, dst=gray)
+        return gray, True
+    return image, False
+
+def _window_sum(ext, h, w, window, out):
+    """
+    Сумма по окну из расширенной таблицы сумм - 4 среза, без копий.
+    """
+    np.subtract(ext[window:window + h, window:window + w], ext[:h, window:window + w], out=out)
+    np.subtract(out, ext[window:window + h, :w], out=out)
+    np.add(out, ext[:h, :w], out=out)
+    return out
+
+def local_mean_std(gray, window, pool=None):
+    """
+    Среднее и СКО по окну window x window вокруг каждого пикселя.
+    У краев окно обрезается границами изображения.
+    Возвращает буферы из пула: после использования их можно вернуть (pool.release).
+    """
+    if window < 1 or window % 2 == 0:
+        raise ValueError("Размер окна должен быть нечетным положительным числом")
+    pool = pool or default_pool
+    h, w = gray.shape
+    r = window // 2
+
+    # Таблицы сумм и сумм квадратов размером (h+1) x (w+1)
+    s = pool.acquire((h + 1, w + 1), np.float64)
+    sq = pool.acquire((h + 1, w + 1), np.float64)
+    cv2.integral2(gray, s, sq, cv2.CV_64F, cv2.CV_64F)
+
+    # Расширяем таблицы повтором краев на r с каждой стороны: тогда окно,
+    # обрезанное границей, берется обычными срезами без проверок
+    ext_shape = (h + 1 + 2 * r, w + 1 + 2 * r)
+    ext = pool.acquire(ext_shape, np.float64)
+    mean = pool.acquire((h, w), np.float64)
+    std = pool.acquire((h, w), np.float64)
+    count = pool.acquire((h, w), np.float64)
+
+    # Число пикселей в обрезанном окне (маленькие векторы длиной h и w)
+    rows = np.minimum(np.arange(h) + r + 1, h) - np.maximum(np.arange(h) - r, 0)
+    cols = np.minimum(np.arange(w) + r + 1, w) - np.maximum(np.arange(w) - r, 0)
+    np.multiply(rows[:, None], cols[None, :], out=count)
+
+    cv2.copyMakeBorder(s, r, r, r, r, cv2.BORDER_REPLICATE, dst=ext)
+    _window_sum(ext, h, w, window, mean)
+    np.divide(mean, count, out=mean)
+
+    cv2.copyMakeBorder(sq, r, r, r, r, cv2.BORDER_REPLICATE, dst=ext)
+    _window_sum(ext, h, w, window, std)
+    np.divide(std, count, out=std)
+
+    # Дисперсия = E[x^2] - m^2 (count как временный буфер)
+    np.multiply(mean, mean, out=count)
+    np.subtract(std, count, out=std)
+    # Отрицательная дисперсия возможна только из-за ошибок округления
+    np.maximum(std, 0, out=std)
+    np.sqrt(std, out=std)
+
+    for buf in (s, sq, ext, count):
+        pool.release(buf)
+    return mean, std
+
+def _binarize(gray, thresh, out, pool):
+    """
+    255 там, где пиксель > порога. thresh - float-буфер, он возвращается в пул.
+    """
+    if out is None:
+        out = np.empty(gray.shape, dtype=np.uint8)
+    mask = pool.acquire(gray.shape, np.bool_)
+    np.greater(gray, thresh, out=mask)
+    np.multiply(mask, np.uint8(255), out=out)
+    pool.release(mask)
+    pool.release(thresh)
+    return out
+
+def _local_threshold(image, window, out, pool, make_threshold):
+    pool = pool or default_pool
+    gray, borrowed = _to_gray(image, pool)
+    mean, std = local_mean_std(gray, window, pool)
+    # Порог считается на месте в буфере mean
+    make_threshold(mean, std)
+    pool.release(std)
+    res = _binarize(gray, mean, out, pool)
+    if borrowed:
+        pool.release(gray)
+    return res
+
+def threshold_mean(image, window=15, c=0, out=None, pool=None):
+    """
+    Метод 3: порог = среднее по окну минус константа C.
+    """
+    def make(mean, std):
+        np.subtract(mean, c, out=mean)
+    return _local_threshold(image, window, out, pool, make)
+
+def threshold_niblack(image, window=15, k=-0.2, out=None, pool=None):
+    """
+    Метод 4 (Ниблэк): T = m + k * s, m и s - среднее и СКО по окну.
+    """
+    def make(mean, std):
+        np.multiply(std, k, out=std)
+        np.add(mean, std, out=mean)
+    return _local_threshold(image, window, out, pool, make)
+
+def threshold_sauvola(image, window=15, k=0.2, r=128, out=None, pool=None):
+    """
+    Метод 5 (Саувола): T = m * (1 + k * (s / R - 1)).
+    Меньше реагирует на шум в однородных областях, чем Ниблэк.
+    """
+    def make(mean, std):
+        np.multiply(std, k / r, out=std)
+        np.add(std, 1 - k, out=std)
+        np.multiply(mean, std, out=mean)
+    return _local_threshold(image, window, out, pool, make)
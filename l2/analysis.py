@@ -0,0 +1,95 @@
+"""
+Анализ изображения "от гистограммы".
+
+Гистограмма (256 корзин) считается один раз на изображение. Из нее без
+повторного прохода по пикселям получаются min/max, порог Оцу и гистограмма
+результата любой поэлементной операции (перенос корзин через LUT).
+Изменение ползунка стоит O(256) для статистики вместо O(число пикселей).
+
+Если передан кэш (cache.LRUCache) и ключ изображения, полутоновая версия и
+гистограммы хранятся в нем и переживают перезапуски Streamlit-скрипта.
+"""
+import numpy as np
+
+from lazy import lazy_import
+from lut import value_histogram
+from processing import otsu_threshold
+
+cv2 = lazy_import("cv2")
+
+class ImageAnalysis:
+    """
+    Кэш статистики одного изображения. Все поля вычисляются лениво и один раз.
+    """
+
+    def __init__(self, image, cache=None, key=None):
+        self.image = image
+        self.cache = cache
+        self.key = key
+        self._hist = None
+        self._gray = None
+        self._gray_hist = None
+
+    def _cached(self, name, compute):
+        if self.cache is None or self.key is None:
+            return compute()
+        return self.cache.get_or_compute((name, self.key), compute)
+
+    @property
+    def is_gray(self):
+        return self.image.ndim == 2
+
+    @property
+    def hist(self):
+        """
+        Гистограмма значений (для цветного - по всем каналам вместе).
+        """
+        if self._hist is None:
+            self._hist = self._cached("hist", lambda: value_histogram(self.image))
+        return self._hist
+
+    @property
+    def gray(self):
+        """
+        Полутоновая версия (для пороговой обработки).
+        """
+        if self._gray is None:
+            if self.is_gray:
+                self._gray = self.image
+            else:
+                self._gray = self._cached(
+                    "gray", lambda: cv2.cvtColor(self.image, cv2.COLOR_RGB2GRAY))
+        return self._gray
+
+    @property
+    def gray_hist(self):
+        if self._gray_hist is None:
+            if self.is_gray:
+                self._gray_hist = self.hist
+            else:
+                self._gray_hist = self._cached("gray_hist", lambda: value_histogram(self.gray))
+        return self._gray_hist
+
+    def min_max(self):
+        """
+        Минимум и максимум значений - первая и последняя непустые корзины.
+        """
+        nonzero = np.flatnonzero(self.hist)
+        if nonzero.size == 0:
+            return 0, 0
+        return int(nonzero[0]), int(nonzero[-1])
+
+    def otsu_threshold(self):
+        return otsu_threshold(self.gray_hist)
+
+    def compile(self, pipeline):
+        """
+        LUT для цепочки поэлементных операций по уже посчитанной гистограмме.
+        """
+        return pipeline.compile(hist=self.hist)
+
+    def result_histogram(self, lut):
+        """
+        Гистограмма результата: корзина v переносится в корзину lut[v].
+        """
+        return np.bincount(lut, weights=self.hist, minlength=256).astype(np.int64)
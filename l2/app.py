@@ -1,73 +1,63 @@
-import streamlit as st
-import cv2
-import numpy as np
-from PIL import Image
-
-# --- ФУНКЦИИ ОБРАБОТКИ ---
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def linear_contrasting(image):
-    """
-    Линейное контрастирование (растяжение гистограммы).
-    Формула: g(x,y) = (f(x,y) - min) / (max - min) * 255
-    """
-    # Конвертируем в float для точности вычислений
-    img_float = image.astype(float)
-    min_val = np.min(img_float)
-    max_val = np.max(img_float)
+import streamlit as st
 
-    # Защита от деления на ноль (если изображение однотонное)
-    if max_val - min_val == 0:
-        return image
+from adaptive import threshold_mean, threshold_niblack, threshold_sauvola
+from analysis import ImageAnalysis
+from cache import LRUCache, content_hash
+from image_io import decode_image, encode_png
+from instrument import Profiler
+from lut import PointPipeline, apply_lut
+from preview import build_pyramid, scale_window, select_level
+from processing import global_threshold_manual
 
-    # Растяжение
-    res = ((img_float - min_val) / (max_val - min_val)) * 255
-    return res.astype(np.uint8)
+# Лимит памяти кэша декодированных изображений, гистограмм и результатов
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Размер предпросмотра (по большей стороне) - примерно ширина колонки на экране
+PREVIEW_SIDE = 1024
+# Сколько последних замеров хранить для экспорта
+PROFILE_HISTORY = 2000
+# Галерея: размер миниатюры (уровень пирамиды) и число колонок
+THUMB_SIDE = 256
+GALLERY_COLUMNS = 4
 
-def pixel_operation_brightness(image, value):
-    """
-    Поэлементная операция: изменение яркости.
-    g(x,y) = f(x,y) + value
-    """
-    # Используем cv2.add для корректного насыщения (чтобы 250+10 стало 255, а не 4)
-    if value >= 0:
-        res = cv2.add(image, np.ones(image.shape, dtype="uint8") * abs(value))
-    else:
-        res = cv2.subtract(image, np.ones(image.shape, dtype="uint8") * abs(value))
-    return res
+@st.cache_resource
+def get_cache():
+    # Один кэш на процесс Streamlit (переживает перезапуски скрипта)
+    return LRUCache(CACHE_MAX_BYTES)
 
-def pixel_operation_invert(image):
-    """
-    Поэлементная операция: негатив (инверсия).
-    g(x,y) = 255 - f(x,y)
-    """
-    return cv2.bitwise_not(image)
+@st.cache_resource
+def get_executor():
+    # Потоки для галереи: cv2 отпускает GIL, поэтому изображения
+    # обрабатываются параллельно
+    return ThreadPoolExecutor(max_workers=os.cpu_count())
 
-def global_threshold_manual(image, threshold):
+def open_image(cache, prof, data, file_key):
     """
-    Метод 1: Простая глобальная пороговая обработка с ручным порогом.
+    Декодирование, гистограмма и пирамида одного файла (все через кэш).
+    Возвращает (analysis, pyramid, gray_level), gray_level(lvl) - полутоновый уровень.
     """
-    # Конвертируем в оттенки серого, если еще не
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-    else:
-        gray = image
-
-    _, binary = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY)
-    return binary
+    # Изображение декодируется один раз на файл
+    with prof.span("decode", bytes=len(data)):
+        img_array = cache.get_or_compute(("image", file_key), lambda: decode_image(data)) # RGB формат
+    # Гистограмма считается один раз, вся статистика берется из нее
+    analysis = ImageAnalysis(img_array, cache=cache, key=file_key)
+    with prof.span("histogram"):
+        analysis.hist
+    # Пирамида уменьшенных копий: интерактивные изменения считаются на уровне
+    # размером с экран, полное разрешение - по запросу
+    with prof.span("pyramid"):
+        pyramid = cache.get_or_compute(("pyramid", file_key), lambda: build_pyramid(img_array))
 
-def global_threshold_otsu(image):
-    """
-    Метод 2: Метод Оцу (Otsu's method).
-    Автоматически ищет порог, минимизирующий внутриклассовую дисперсию.
-    """
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-    else:
-        gray = image
+    def gray_level(lvl):
+        if analysis.is_gray:
+            return pyramid[lvl]
+        with prof.span("gray"):
+            return cache.get_or_compute(("gray_pyramid", file_key),
+                                        lambda: build_pyramid(analysis.gray))[lvl]
 
-    # thresh_val вернет вычисленный порог, binary - результат
-    thresh_val, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    return thresh_val, binary
+    return analysis, pyramid, gray_level
 
 # --- ИНТЕРФЕЙС ПРИЛОЖЕНИЯ ---
 
@@ -79,26 +69,31 @@ st.markdown("**Студент:** [Твое Имя] | **Группа:** [Твоя
 task = st.sidebar.selectbox(
     "Выберите метод обработки",
     ("1. Поэлементные операции + Линейное контрастирование",
-     "2. Глобальная пороговая обработка (2 метода)")
+     "2. Пороговая обработка (глобальная и адаптивная)")
 )
 
-# Загрузка изображения
-uploaded_file = st.sidebar.file_uploader("Загрузите изображение", type=["jpg", "png", "jpeg", "bmp"])
+# Загрузка изображений (одно - подробный просмотр, несколько - галерея)
+uploaded_files = st.sidebar.file_uploader("Загрузите изображения", type=["jpg", "png", "jpeg", "bmp"],
+                                          accept_multiple_files=True)
 
-if uploaded_file is not None:
-    # Чтение изображения
-    image = Image.open(uploaded_file)
-    img_array = np.array(image) # RGB формат
+# Streamlit прерывает запуск скрипта при каждом изменении виджета, и до
+# prof.stop() дело может не дойти. Профилировщик прерванного запуска этой
+# сессии остается здесь - останавливаем запущенный им tracemalloc, иначе
+# трассировка осталась бы включенной и после снятия галочки
+stale_prof = st.session_state.pop("profiler", None)
+if stale_prof is not None:
+    stale_prof.stop()
 
-    # Отображение оригинала
-    col1, col2 = st.columns(2)
-    with col1:
-        st.subheader("Исходное изображение")
-        st.image(image, use_container_width=True)
-        # Гистограмма оригинала
-        if len(img_array.shape) == 2: # Градации серого
-             hist_vals, _ = np.histogram(img_array, bins=256, range=(0,256))
-             st.bar_chart(hist_vals)
+if uploaded_files:
+    cache = get_cache()
+    # Замеры этого запуска скрипта (память - если включено на панели профилирования)
+    prof = Profiler(track_memory=st.session_state.get("profile_memory", False))
+    st.session_state["profiler"] = prof
+
+    view = 0
+    if len(uploaded_files) > 1:
+        view = st.sidebar.selectbox("Просмотр", range(-1, len(uploaded_files)),
+                                    format_func=lambda i: "Галерея" if i < 0 else uploaded_files[i].name)
 
     # --- ЛОГИКА ЗАДАНИЯ 1 ---
     # Проверка по первому символу строки ("1")
@@ -108,43 +103,40 @@ if uploaded_file is not None:
         # Выбор подоперации
         op_mode = st.sidebar.radio("Операция:", ["Изменение яркости", "Инверсия (Негатив)", "Линейное контрастирование"])
 
-        processed_img = img_array.copy()
+        # Все три операции - поэлементные: собираем LUT и применяем за один проход
+        pipeline = PointPipeline()
 
         if op_mode == "Изменение яркости":
             st.info("Поэлементная операция: к значению каждого пикселя добавляется константа.")
             val = st.sidebar.slider("Уровень яркости", -100, 100, 0)
-            processed_img = pixel_operation_brightness(img_array, val)
+            pipeline.brightness(val)
 
         elif op_mode == "Инверсия (Негатив)":
             st.info("Поэлементная операция: вычитание значения пикселя из 255.")
-            processed_img = pixel_operation_invert(img_array)
+            pipeline.invert()
 
         elif op_mode == "Линейное контрастирование":
             st.info("""
             **Линейное контрастирование:** Метод расширяет узкий диапазон яркостей изображения на весь доступный диапазон (0-255).
             Идеально подходит для малоконтрастных изображений.
             """)
-            processed_img = linear_contrasting(img_array)
+            pipeline.contrast()
 
-        with col2:
-            st.subheader("Результат")
-            st.image(processed_img, use_container_width=True)
-            # Гистограмма результата для наглядности (особенно важно для контрастирования)
-            if op_mode == "Линейное контрастирование":
-                st.write("Гистограмма результата:")
-                # Упрощаем до градаций серого для графика
-                if len(processed_img.shape) == 3:
-                    gray_res = cv2.cvtColor(processed_img, cv2.COLOR_RGB2GRAY)
-                else:
-                    gray_res = processed_img
-                hist_vals_res, _ = np.histogram(gray_res, bins=256, range=(0,256))
-                st.bar_chart(hist_vals_res)
+        def make_job(file_key, analysis, pyramid, gray_level):
+            # LUT строится по гистограмме полного изображения, поэтому предпросмотр
+            # использует те же min/max, что и результат в полном разрешении
+            lut = analysis.compile(pipeline)
+            # Ключ - сама таблица: разные параметры с одинаковой LUT дают один результат
+            result_key = ("point", file_key, lut.tobytes())
+            return result_key, lambda lvl: apply_lut(pyramid[lvl], lut), "Результат"
 
     # --- ЛОГИКА ЗАДАНИЯ 2 ---
     # Проверка по первому символу строки ("2")
     elif task.startswith("2"):
         st.sidebar.header("Выбор метода бинаризации")
-        thresh_method = st.sidebar.radio("Метод:", ["Ручной порог (Manual)", "Метод Оцу (Otsu)"])
+        thresh_method = st.sidebar.radio("Метод:", ["Ручной порог (Manual)", "Метод Оцу (Otsu)",
+                                                    "Адаптивный: среднее", "Адаптивный: Ниблэк",
+                                                    "Адаптивный: Саувола"])
 
         st.info("Обратите внимание: Пороговая обработка обычно применяется к полутоновым (gray-scale) изображениям.")
 
@@ -156,11 +148,11 @@ if uploaded_file is not None:
             Иначе $pixel = 0$ (черный).
             """)
             t_val = st.sidebar.slider("Значение порога (Threshold)", 0, 255, 127)
-            res_binary = global_threshold_manual(img_array, t_val)
 
-            with col2:
-                st.subheader(f"Результат (Порог: {t_val})")
-                st.image(res_binary, use_container_width=True, clamp=True)
+            def make_job(file_key, analysis, pyramid, gray_level):
+                result_key = ("threshold", file_key, t_val)
+                compute = lambda lvl: global_threshold_manual(gray_level(lvl), t_val)
+                return result_key, compute, f"Результат (Порог: {t_val})"
 
         elif thresh_method == "Метод Оцу (Otsu)":
             st.write("""
@@ -169,13 +161,171 @@ if uploaded_file is not None:
             так, чтобы минимизировать внутриклассовую дисперсию.
             Хорошо работает на бимодальных гистограммах.
             """)
-            calc_thresh, res_binary = global_threshold_otsu(img_array)
 
-            with col2:
-                st.subheader(f"Результат (Авто-порог: {calc_thresh})")
-                st.image(res_binary, use_container_width=True, clamp=True)
+            def make_job(file_key, analysis, pyramid, gray_level):
+                # Порог по уже посчитанной гистограмме яркости
+                calc_thresh = analysis.otsu_threshold()
+                result_key = ("threshold", file_key, calc_thresh)
+                compute = lambda lvl: global_threshold_manual(gray_level(lvl), calc_thresh)
+                return result_key, compute, f"Результат (Авто-порог: {calc_thresh})"
+
+        else:
+            st.write("""
+            **Адаптивная (локальная) бинаризация:**
+            Порог $T(x,y)$ свой для каждого пикселя и считается по окну вокруг него
+            (среднее $m$ и СКО $s$ берутся из интегральных изображений, поэтому скорость не зависит от размера окна).
+            * Среднее: $T = m - C$
+            * Ниблэк: $T = m + k \\cdot s$
+            * Саувола: $T = m \\cdot (1 + k \\cdot (s / R - 1))$, $R = 128$
+
+            Справляется с неравномерным освещением (градиентом фона), на котором глобальный порог ошибается.
+            """)
+            window = st.sidebar.slider("Размер окна", 3, 301, 31, step=2)
+            if thresh_method == "Адаптивный: среднее":
+                param = st.sidebar.slider("Константа C", -50, 50, 0)
+                method = threshold_mean
+            elif thresh_method == "Адаптивный: Ниблэк":
+                param = st.sidebar.slider("Коэффициент k", -1.0, 1.0, -0.2, step=0.05)
+                method = threshold_niblack
+            else:
+                param = st.sidebar.slider("Коэффициент k", 0.0, 1.0, 0.2, step=0.05)
+                method = threshold_sauvola
+
+            def make_job(file_key, analysis, pyramid, gray_level):
+                # На уменьшенном уровне окно уменьшается во столько же раз
+                result_key = ("adaptive", file_key, thresh_method, window, param)
+                compute = lambda lvl: method(gray_level(lvl), scale_window(window, lvl), param)
+                return result_key, compute, f"Результат (окно {window}x{window})"
+
+        op_mode = thresh_method
+
+    if view < 0:
+        # --- ГАЛЕРЕЯ ---
+        # Каждое изображение обрабатывается в своем потоке на уровне пирамиды размером
+        # с миниатюру. Результаты лежат в общем кэше по ключу (операция, файл,
+        # параметры, уровень), поэтому при смене параметра или добавлении файла
+        # пересчитываются только изображения, чей ключ изменился.
+        def gallery_item(upload):
+            data = upload.getvalue()
+            file_key = content_hash(data)
+            analysis, pyramid, gray_level = open_image(cache, prof, data, file_key)
+            result_key, compute, title = make_job(file_key, analysis, pyramid, gray_level)
+            lvl = select_level(pyramid, THUMB_SIDE)
+            with prof.span(op_mode, level=lvl, file=upload.name):
+                result = cache.get_or_compute(result_key + (lvl,), lambda: compute(lvl))
+            return result, title
+
+        st.subheader(f"Галерея (изображений: {len(uploaded_files)})")
+        columns = st.columns(GALLERY_COLUMNS)
+        slots = []
+        for i, upload in enumerate(uploaded_files):
+            slot = columns[i % GALLERY_COLUMNS].empty()
+            slot.caption(f"{upload.name}: обработка...")
+            slots.append(slot)
+
+        # Миниатюры выводятся по мере готовности, а не после самого медленного файла
+        executor = get_executor()
+        futures = {executor.submit(gallery_item, upload): i for i, upload in enumerate(uploaded_files)}
+        try:
+            with prof.span("gallery", files=len(uploaded_files)):
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        result, title = future.result()
+                    except Exception as exc:
+                        slots[i].error(f"{uploaded_files[i].name}: {exc}")
+                        continue
+                    slots[i].image(result, caption=f"{uploaded_files[i].name} - {title}",
+                                   use_container_width=True, clamp=True)
+        finally:
+            # Если Streamlit прервал запуск (пользователь сдвинул ползунок), еще не
+            # начатые задачи отменяем; уже идущие досчитаются и попадут в кэш
+            for future in futures:
+                future.cancel()
+
+    else:
+        # --- ПОДРОБНЫЙ ПРОСМОТР ОДНОГО ИЗОБРАЖЕНИЯ ---
+        data = uploaded_files[view].getvalue()
+        file_key = content_hash(data)
+        analysis, pyramid, gray_level = open_image(cache, prof, data, file_key)
+        img_array = analysis.image
+
+        level = 0
+        if len(pyramid) > 1 and st.sidebar.checkbox("Быстрый предпросмотр", value=True):
+            level = select_level(pyramid, PREVIEW_SIDE)
+
+        # Отображение оригинала
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("Исходное изображение")
+            with prof.span("render", what="original"):
+                st.image(pyramid[level], use_container_width=True)
+            # Гистограмма оригинала
+            if len(img_array.shape) == 2: # Градации серого
+                 st.bar_chart(analysis.hist)
+
+        result_key, compute, title = make_job(file_key, analysis, pyramid, gray_level)
+        with prof.span(op_mode, level=level):
+            processed_img = cache.get_or_compute(result_key + (level,), lambda: compute(level))
+
+        with col2:
+            st.subheader(title)
+            with prof.span("render", what="result"):
+                st.image(processed_img, use_container_width=True, clamp=True)
+            if op_mode == "Линейное контрастирование":
+                min_val, max_val = analysis.min_max()
+                st.write(f"Диапазон исходного изображения: {min_val} - {max_val}")
+                # Гистограмма результата для наглядности. Гистограмма исходника
+                # переносится через LUT - без прохода по пикселям
+                # (для цветного изображения - по значениям всех каналов)
+                st.write("Гистограмма результата:")
+                st.bar_chart(analysis.result_histogram(analysis.compile(pipeline)))
+
+        # --- ЭКСПОРТ В ПОЛНОМ РАЗРЕШЕНИИ ---
+        if level > 0:
+            h, w = img_array.shape[:2]
+            ph, pw = pyramid[level].shape[:2]
+            col2.caption(f"Предпросмотр {pw}x{ph} (полное разрешение {w}x{h})")
+        if st.sidebar.button("Рассчитать в полном разрешении"):
+            with prof.span("full_resolution"):
+                full = cache.get_or_compute(result_key + (0,), lambda: compute(0))
+            with prof.span("encode_png"):
+                png = encode_png(full)
+            st.sidebar.download_button("Скачать результат (PNG)", png,
+                                       file_name="result.png", mime="image/png")
+
+    # --- ПАНЕЛЬ ПРОФИЛИРОВАНИЯ ---
+    prof.stop()
+    del st.session_state["profiler"]
+    history = st.session_state.setdefault("profile_history", [])
+    history.extend(prof.records)
+    del history[:-PROFILE_HISTORY]
+    with st.sidebar.expander("Профилирование"):
+        st.checkbox("Замерять память (медленнее)", key="profile_memory")
+        st.dataframe(
+            [{"Этап": r["name"], "мс": round(r["duration_ns"] / 1e6, 2),
+              "Пик, МБ": round(r.get("peak_bytes", 0) / 2**20, 2),
+              "Пик ≈": r.get("peak_approx", False),
+              "Осталось, МБ": round(r.get("retained_bytes", 0) / 2**20, 2)}
+             for r in prof.records],
+            hide_index=True)
+        st.caption(f"Всего: {sum(r['duration_ns'] for r in prof.records if r['depth'] == 0) / 1e6:.1f} мс; "
+                   f"в истории {len(history)} замеров")
+        if any(r.get("peak_approx") for r in prof.records):
+            st.caption("Пик ≈: этап шел одновременно с другими потоками (галерея), "
+                       "tracemalloc общий на процесс - пик приблизительный")
+        st.download_button("Экспорт JSON", prof.to_json(history),
+                           file_name="profile.json", mime="application/json")
+        st.download_button("Экспорт Chrome trace", prof.to_chrome_trace(history),
+                           file_name="trace.json", mime="application/json")
+
+    stats = cache.stats()
+    st.sidebar.caption(
+        f"Кэш: попаданий {stats['hits']}, промахов {stats['misses']} "
+        f"({stats['hit_rate']:.0%}), {stats['entries']} записей, "
+        f"{stats['bytes'] / 2**20:.1f} / {stats['max_bytes'] / 2**20:.0f} МБ")
 
 else:
-    st.warning("Пожалуйста, загрузите изображение для начала работы.")
+    st.warning("Пожалуйста, загрузите изображение (или несколько) для начала работы.")
     st.markdown("### Генерация тестовых изображений")
     st.markdown("Если у вас нет подходящих изображений, вы можете сгенерировать их скриптом в задании.")
@@ -0,0 +1,187 @@
+"""
+Пакетная обработка изображений из командной строки (без Streamlit).
+
+Пример:
+    python batch.py scans/ -o out/ --ops "contrast,otsu" -j 8
+    python batch.py "scans/**/*.png" -o out/ --ops "brightness=-20,threshold=127"
+"""
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from image_io import read_image, write_image
+from lazy import lazy_import
+from processing import apply_chain, parse_chain
+
+cv2 = lazy_import("cv2")
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+def _glob_root(pattern):
+    """
+    Каталог, с которого начинается glob-шаблон: части пути до первой с * ? [.
+    """
+    parts = pattern.replace("\\", "/").split("/")
+    root = []
+    for part in parts[:-1]:
+        if any(c in part for c in "*?["):
+            break
+        root.append(part)
+    if not root:
+        return "."
+    return "/".join(root) or "/"
+
+def collect_jobs(patterns):
+    """
+    Файлы с путями результатов: список (файл, путь относительно каталога
+    результатов). Для каталога это имя файла, для glob-шаблона - путь от его
+    корня ("scans/**/*.png": scans/a/x.png -> a/x.png), так что одинаковые
+    имена из разных подкаталогов не затирают друг друга.
+    """
+    jobs = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            names = sorted(os.listdir(pattern))
+            jobs.extend((os.path.join(pattern, n), n) for n in names
+                        if n.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            root = _glob_root(pattern)
+            jobs.extend((path, os.path.relpath(path, root))
+                        for path in sorted(glob.glob(pattern, recursive=True)))
+    return jobs
+
+def collect_inputs(patterns):
+    """
+    Собирает список файлов: каталог (все изображения в нем) или glob-шаблон.
+    """
+    return [path for path, _ in collect_jobs(patterns)]
+
+def find_collisions(jobs):
+    """
+    Пути результатов, которые получили несколько входных файлов.
+    """
+    seen = {}
+    for path, name in jobs:
+        seen.setdefault(os.path.normcase(os.path.normpath(name)), []).append(path)
+    return {name: paths for name, paths in seen.items() if len(paths) > 1}
+
+# Состояние процесса-обработчика (задается один раз в initializer)
+_worker_chain = None
+_worker_out_dir = None
+
+def _init_worker(chain, out_dir):
+    global _worker_chain, _worker_out_dir
+    _worker_chain = chain
+    _worker_out_dir = out_dir
+    # Каждый процесс работает в один поток, параллелизм дает пул
+    cv2.setNumThreads(1)
+
+def process_file(job):
+    """
+    Обработка одного файла: job - (файл, путь результата относительно
+    каталога результатов). Возвращает строку отчета (путь, времена в мс, ошибка).
+    """
+    path, name = job
+    t0 = time.perf_counter()
+    try:
+        img = read_image(path)
+        t1 = time.perf_counter()
+        res = apply_chain(img, _worker_chain)
+        t2 = time.perf_counter()
+        out_path = os.path.join(_worker_out_dir, name)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        write_image(out_path, res)
+        t3 = time.perf_counter()
+    except Exception as e:
+        return {"file": path, "read_ms": 0.0, "process_ms": 0.0, "write_ms": 0.0,
+                "total_ms": (time.perf_counter() - t0) * 1000, "error": str(e)}
+    return {"file": path,
+            "read_ms": (t1 - t0) * 1000,
+            "process_ms": (t2 - t1) * 1000,
+            "write_ms": (t3 - t2) * 1000,
+            "total_ms": (t3 - t0) * 1000,
+            "error": ""}
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+def print_summary(rows, wall_s, stream=sys.stdout):
+    ok = [r for r in rows if not r["error"]]
+    failed = len(rows) - len(ok)
+    print(f"Обработано: {len(ok)} файлов, ошибок: {failed}, время: {wall_s:.2f} с", file=stream)
+    if wall_s > 0:
+        print(f"Пропускная способность: {len(ok) / wall_s:.1f} файлов/с", file=stream)
+    for key in ("read_ms", "process_ms", "write_ms", "total_ms"):
+        vals = sorted(r[key] for r in ok)
+        if not vals:
+            break
+        mean = sum(vals) / len(vals)
+        print(f"  {key:<11} среднее {mean:8.2f}  p50 {_percentile(vals, 0.5):8.2f}  "
+              f"p95 {_percentile(vals, 0.95):8.2f}  макс {vals[-1]:8.2f}", file=stream)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетная обработка изображений (операции из app.py)")
+    parser.add_argument("inputs", nargs="+", help="Каталог или glob-шаблон (можно несколько)")
+    parser.add_argument("-o", "--out", required=True, help="Каталог для результатов")
+    parser.add_argument("--ops", required=True,
+                        help="Цепочка операций: brightness=N, invert, contrast, threshold=N, otsu")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(),
+                        help="Число процессов (по умолчанию - число ядер)")
+    parser.add_argument("--chunksize", type=int, default=16, help="Файлов на одну задачу пула")
+    parser.add_argument("--timings", help="CSV-файл с временем обработки каждого файла")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Не печатать строку на каждый файл")
+    args = parser.parse_args(argv)
+
+    if args.workers is not None and args.workers < 1:
+        parser.error("-j/--workers: нужен хотя бы один процесс")
+    try:
+        chain = parse_chain(args.ops)
+    except ValueError as e:
+        parser.error(str(e))
+
+    jobs = collect_jobs(args.inputs)
+    if not jobs:
+        print("Нет входных файлов", file=sys.stderr)
+        return 1
+    collisions = find_collisions(jobs)
+    if collisions:
+        for name, paths in sorted(collisions.items()):
+            print(f"Один результат {name} у нескольких файлов: {', '.join(paths)}", file=sys.stderr)
+        return 1
+    os.makedirs(args.out, exist_ok=True)
+
+    timings_file = open(args.timings, "w", newline="") if args.timings else None
+    writer = None
+    if timings_file:
+        writer = csv.DictWriter(timings_file,
+                                fieldnames=["file", "read_ms", "process_ms", "write_ms", "total_ms", "error"])
+        writer.writeheader()
+
+    rows = []
+    start = time.perf_counter()
+    with Pool(args.workers, initializer=_init_worker, initargs=(chain, args.out)) as pool:
+        # Результаты приходят по мере готовности, а не после всей пачки
+        for row in pool.imap_unordered(process_file, jobs, chunksize=args.chunksize):
+            rows.append(row)
+            if writer:
+                writer.writerow(row)
+            if row["error"]:
+                print(f"ОШИБКА {row['file']}: {row['error']}", file=sys.stderr)
+            elif not args.quiet:
+                print(f"{row['file']}: {row['total_ms']:.1f} мс")
+    wall = time.perf_counter() - start
+    if timings_file:
+        timings_file.close()
+
+    print_summary(rows, wall)
+    return 1 if any(r["error"] for r in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
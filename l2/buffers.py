@@ -0,0 +1,80 @@
+"""
+Пул переиспользуемых буферов для обработки без выделения памяти.
+
+Буферы хранятся по ключу (форма, тип). Для потока кадров одного размера
+после первого кадра все временные массивы берутся из пула, и новых
+крупных выделений памяти не происходит (см. счетчик allocations).
+
+Пример:
+    pool = BufferPool()
+    out = pool.acquire(frame.shape)
+    pixel_operation_invert(frame, out=out)
+    ...
+    pool.release(out)
+
+Что после прогрева apply_chain и пороговые операции с out= не выделяют
+буферов, проверяет test_buffers.py.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+class BufferPool:
+    def __init__(self, max_free_bytes=None):
+        # max_free_bytes: предел памяти под свободные буферы; лишние
+        # возвращенные буферы просто отдаются сборщику мусора
+        self.max_free_bytes = max_free_bytes
+        self.free_bytes = 0
+        self._free = defaultdict(list)  # (форма, тип) -> свободные буферы
+        self._lock = threading.Lock()
+        self.allocations = 0  # сколько раз пришлось выделить новый массив
+        self.reuses = 0       # сколько раз буфер взят из пула
+
+    def acquire(self, shape, dtype=np.uint8):
+        """
+        Буфер нужной формы и типа (содержимое не инициализировано).
+        """
+        key = (tuple(shape), np.dtype(dtype))
+        with self._lock:
+            free = self._free[key]
+            if free:
+                self.reuses += 1
+                buf = free.pop()
+                self.free_bytes -= buf.nbytes
+                return buf
+            self.allocations += 1
+        return np.empty(key[0], dtype=key[1])
+
+    def release(self, buf):
+        """
+        Возврат буфера в пул. После этого им нельзя пользоваться.
+        """
+        if buf is None or buf.base is not None:
+            # Срезы и представления чужих массивов в пул не берем
+            return
+        key = (buf.shape, buf.dtype)
+        with self._lock:
+            if self.max_free_bytes is not None and self.free_bytes + buf.nbytes > self.max_free_bytes:
+                return
+            self._free[key].append(buf)
+            self.free_bytes += buf.nbytes
+
+    @contextmanager
+    def borrow(self, shape, dtype=np.uint8):
+        buf = self.acquire(shape, dtype)
+        try:
+            yield buf
+        finally:
+            self.release(buf)
+
+    def stats(self):
+        with self._lock:
+            cached = sum(len(v) for v in self._free.values())
+        return {"allocations": self.allocations, "reuses": self.reuses,
+                "free_buffers": cached, "free_bytes": self.free_bytes}
+
+# Общий пул для временных массивов внутри операций. Ограничен, чтобы
+# изображения разных размеров (например, в приложении) не копили буферы
+default_pool = BufferPool(max_free_bytes=512 * 1024 * 1024)
@@ -0,0 +1,150 @@
+"""
+Ограниченный по памяти LRU-кэш для результатов обработки.
+
+Ключи - кортежи вида (что, хэш файла, параметры...). Размер записи
+считается по nbytes массивов; при превышении лимита вытесняются давно
+не использованные записи.
+
+Один и тот же массив может лежать в нескольких записях (уровень 0 пирамиды -
+само изображение, полутоновая версия - уровень 0 полутоновой пирамиды).
+Такой массив (а для вида - массив-владелец памяти) учитывается один раз и
+освобождается из учета вместе с последней записью, которая на него ссылается.
+"""
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+def content_hash(data):
+    """
+    Хэш содержимого файла - ключ для всех производных данных.
+    """
+    return hashlib.sha1(data).hexdigest()
+
+def sizeof(value):
+    """
+    Примерный объем памяти значения в байтах.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+def _owner(arr):
+    """
+    Массив, которому принадлежит память (для вида - его base).
+    """
+    while isinstance(arr.base, np.ndarray):
+        arr = arr.base
+    return arr
+
+def _footprint(value, arrays):
+    """
+    Байты значения без массивов; сами массивы (их владельцы) - в arrays.
+    """
+    if isinstance(value, np.ndarray):
+        arrays.append(_owner(value))
+        return 0
+    if isinstance(value, (tuple, list)):
+        return sum(_footprint(v, arrays) for v in value)
+    return sys.getsizeof(value)
+
+class LRUCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # ключ -> (значение, байты без массивов, массивы)
+        # id массива -> [число ссылок из записей, nbytes]; массив жив, пока
+        # на него ссылается запись, поэтому id не переиспользуется
+        self._arrays = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def _add_arrays(self, arrays):
+        added = 0
+        for arr in arrays:
+            ref = self._arrays.get(id(arr))
+            if ref is None:
+                self._arrays[id(arr)] = [1, arr.nbytes]
+                added += arr.nbytes
+            else:
+                ref[0] += 1
+        return added
+
+    def _drop(self, key):
+        _, other, arrays = self._data.pop(key)
+        freed = other
+        for arr in arrays:
+            ref = self._arrays[id(arr)]
+            ref[0] -= 1
+            if ref[0] == 0:
+                del self._arrays[id(arr)]
+                freed += ref[1]
+        self.current_bytes -= freed
+
+    def put(self, key, value):
+        arrays = []
+        other = _footprint(value, arrays)
+        size = other + sum(arr.nbytes for arr in {id(a): a for a in arrays}.values())
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            # Слишком большие значения не кэшируем вовсе
+            if size > self.max_bytes:
+                return value
+            self._data[key] = (value, other, arrays)
+            self.current_bytes += other + self._add_arrays(arrays)
+            while self.current_bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+        return value
+
+    def get_or_compute(self, key, compute):
+        """
+        Значение из кэша или результат compute() (который сразу кладется в кэш).
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+        # Вычисление - вне блокировки, чтобы не тормозить другие потоки
+        return self.put(key, compute())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._arrays.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._data),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+        }
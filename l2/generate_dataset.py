@@ -0,0 +1,175 @@
+"""
+Генератор наборов тестовых изображений для нагрузочных тестов и бенчмарков.
+
+Те же два вида картинок, что и в generate_images.py (малоконтрастная и
+с градиентом для пороговой обработки), но:
+  * любого размера (вплоть до 20000 x 20000) - изображение строится полосами,
+    заполнение только векторными операциями;
+  * воспроизводимо: изображение i зависит только от (seed, i);
+  * тысячи файлов в несколько процессов;
+  * PNG или .npy / сырой uint8 (их можно открыть через memmap, см. tiled.py);
+  * manifest.json со списком файлов и параметров.
+
+Пример:
+    python generate_dataset.py -o dataset/ --count 1000 --size 1024x1024 -j 8
+    python generate_dataset.py -o big/ --count 4 --size 20000x20000 --format npy
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+KINDS = ("low_contrast", "threshold_test")
+FORMATS = ("png", "npy", "raw")
+
+# Высота полосы. Шум полосы зависит только от (seed, номер полосы), поэтому
+# результат не зависит от формата вывода и числа процессов
+BAND_ROWS = 1024
+
+# --- Описание сцены (параметры фигур) ---
+
+def _scene(kind, rng, h, w):
+    """
+    Случайные (но воспроизводимые) параметры фигур. Базовая раскладка -
+    как в generate_images.py для 300x300, масштабированная под размер.
+    """
+    s = min(h, w) / 300.0
+    jitter = lambda v: int(round(v * s + rng.uniform(-20, 20) * s))
+    if kind == "low_contrast":
+        bg = int(rng.integers(90, 111))
+        return {
+            "background": bg,
+            "circle": (jitter(150) + (w - min(h, w)) // 2, jitter(150) + (h - min(h, w)) // 2,
+                       max(1, int(100 * s * rng.uniform(0.8, 1.1))), bg + int(rng.integers(12, 25))),
+            "rect": (jitter(50), jitter(50), max(1, int(50 * s)), bg + int(rng.integers(6, 15))),
+            "noise": float(rng.uniform(3, 7)),
+        }
+    return {
+        "gradient": (float(rng.uniform(100, 180)), bool(rng.integers(0, 2))),  # размах, слева направо?
+        "circle": (jitter(150) + (w - min(h, w)) // 2, jitter(150) + (h - min(h, w)) // 2,
+                   max(1, int(50 * s * rng.uniform(0.8, 1.2))), int(rng.integers(180, 221))),
+        "text": ("TEST", jitter(50), jitter(250), 2 * s, max(1, int(round(3 * s)))),
+        "noise": 0.0,
+    }
+
+def _draw_band(kind, scene, band, y0, w):
+    """
+    Рисует полосу строк [y0, y0 + len(band)) изображения. Координаты фигур
+    сдвигаются на y0: cv2 сам обрезает то, что не попало в полосу.
+    """
+    if kind == "low_contrast":
+        band[:] = scene["background"]
+        cx, cy, r, v = scene["circle"]
+        cv2.circle(band, (cx, cy - y0), r, v, -1)
+        x, y, side, v = scene["rect"]
+        cv2.rectangle(band, (x, y - y0), (x + side, y + side - y0), v, -1)
+    else:
+        span, left_to_right = scene["gradient"]
+        # Градиент по столбцам - одна строка и broadcasting на всю полосу
+        ramp = np.arange(w, dtype=np.float32) * (span / max(1, w - 1))
+        if not left_to_right:
+            ramp = ramp[::-1]
+        band[:] = ramp.astype(np.uint8)
+        cx, cy, r, v = scene["circle"]
+        cv2.circle(band, (cx, cy - y0), r, v, -1)
+        text, x, y, scale, thickness = scene["text"]
+        cv2.putText(band, text, (x, y - y0), cv2.FONT_HERSHEY_SIMPLEX, scale, 255, thickness)
+
+def _add_noise(band, sigma, seed, band_index):
+    if sigma <= 0:
+        return
+    rng = np.random.default_rng([seed, band_index])
+    noise = rng.standard_normal(band.shape, dtype=np.float32)
+    noise *= sigma
+    noise += band
+    np.clip(noise, 0, 255, out=noise)
+    np.rint(noise, out=noise)
+    band[:] = noise
+
+def generate_into(out, kind, seed):
+    """
+    Заполняет массив out (H, W) uint8 - обычный или memmap - полосами.
+    """
+    h, w = out.shape
+    scene = _scene(kind, np.random.default_rng(seed), h, w)
+    for index, y0 in enumerate(range(0, h, BAND_ROWS)):
+        band = out[y0:y0 + BAND_ROWS]
+        _draw_band(kind, scene, band, y0, w)
+        _add_noise(band, scene["noise"], seed, index)
+    return scene
+
+def generate_image(kind, seed, height, width):
+    img = np.empty((height, width), dtype=np.uint8)
+    generate_into(img, kind, seed)
+    return img
+
+def _write_one(task):
+    out_dir, index, kind, seed, height, width, fmt = task
+    name = f"{kind}_{index:06d}.{fmt}"
+    path = os.path.join(out_dir, name)
+    t0 = time.perf_counter()
+    if fmt == "png":
+        img = generate_image(kind, seed, height, width)
+        if not cv2.imwrite(path, img):
+            raise ValueError(f"Не удалось записать {path}")
+    else:
+        # Пишем прямо в файл через memmap: в памяти только одна полоса
+        if fmt == "npy":
+            out = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(height, width))
+        else:
+            out = np.memmap(path, dtype=np.uint8, mode="w+", shape=(height, width))
+        generate_into(out, kind, seed)
+        out.flush()
+        del out
+    return {"file": name, "kind": kind, "seed": seed, "height": height, "width": width,
+            "format": fmt, "dtype": "uint8", "seconds": round(time.perf_counter() - t0, 4)}
+
+def _parse_size(text):
+    w, _, h = text.lower().partition("x")
+    return int(h or w), int(w)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генератор наборов тестовых изображений")
+    parser.add_argument("-o", "--out", required=True, help="Каталог набора")
+    parser.add_argument("--count", type=int, default=100, help="Изображений каждого вида")
+    parser.add_argument("--kind", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--size", type=_parse_size, default=(300, 300), help="ШxВ, например 2048x1536")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--seed", type=int, default=0, help="Базовое зерно генератора")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    height, width = args.size
+    os.makedirs(args.out, exist_ok=True)
+    tasks = []
+    for k, kind in enumerate(args.kind):
+        for i in range(args.count):
+            # Зерно изображения зависит только от базового зерна, вида и номера
+            seed = args.seed * 1_000_003 + KINDS.index(kind) * 100_000_007 + i
+            tasks.append((args.out, i, kind, seed, height, width, args.format))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        entries = list(pool.map(_write_one, tasks, chunksize=max(1, len(tasks) // (8 * (args.workers or 1)))))
+    wall = time.perf_counter() - start
+
+    manifest = {
+        "seed": args.seed,
+        "height": height,
+        "width": width,
+        "format": args.format,
+        "count": len(entries),
+        "images": entries,
+    }
+    with open(os.path.join(args.out, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    print(f"Создано {len(entries)} изображений {width}x{height} ({args.format}) за {wall:.2f} с в {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
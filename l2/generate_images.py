@@ -20,9 +20,8 @@ def create_threshold_test_image():
     # Создаем градиент (плохо для глобального порога) и четкие фигуры (хорошо для Оцу)
     img = np.zeros((300, 300), dtype=np.uint8)
 
-    # Фон - градиент
-    for i in range(300):
-        img[:, i] = i * 0.5
+    # Фон - градиент (одна строка значений, размноженная на все строки)
+    img[:] = (np.arange(300) * 0.5).astype(np.uint8)
 
     # Объекты (яркие на темном фоне и темные на ярком)
     cv2.circle(img, (150, 150), 50, 200, -1)
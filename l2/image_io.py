@@ -0,0 +1,45 @@
+"""
+Чтение и запись изображений - общие для приложения, batch.py и stream.py.
+
+Изображения везде в одном виде: градации серого (H, W) или RGB (H, W, 3).
+OpenCV и PIL импортируются при первом использовании.
+"""
+import io
+
+import numpy as np
+
+from lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+PIL_Image = lazy_import("PIL.Image")
+
+def read_image(path):
+    """
+    Чтение изображения в том же виде, что и в приложении: градации серого или RGB.
+    """
+    img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        raise ValueError("не удалось прочитать изображение")
+    if img.ndim == 3:
+        if img.shape[2] == 4:
+            img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGB)
+        else:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    return img
+
+def write_image(path, img):
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+    if not cv2.imwrite(path, img):
+        raise ValueError("не удалось записать результат")
+
+def decode_image(data):
+    """
+    Декодирование загруженного файла (байты) через PIL.
+    """
+    return np.array(PIL_Image.open(io.BytesIO(data)))
+
+def encode_png(image):
+    buf = io.BytesIO()
+    PIL_Image.fromarray(image).save(buf, format="PNG")
+    return buf.getvalue()
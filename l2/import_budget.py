@@ -0,0 +1,74 @@
+"""
+Проверка времени импорта модулей обработки.
+
+Процессы-обработчики (batch.py, stream.py) импортируют модули обработки при
+старте, поэтому импорт должен быть быстрым и не тянуть за собой интерфейс
+и тяжелые библиотеки. Для каждого модуля запускается чистый интерпретатор,
+в нем замеряется время `import <модуль>` (медиана по нескольким запускам)
+и проверяется, что не загрузились запрещенные модули (streamlit, cv2, PIL).
+
+Пример:
+    python import_budget.py
+    python import_budget.py --budget-ms 150 --runs 9 processing lut
+
+Код возврата 1, если какой-то модуль превысил бюджет или загрузил лишнее.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Модули, которые должны импортироваться быстро и без интерфейса
+CORE_MODULES = ("processing", "lut", "buffers", "otsu_batch", "analysis", "adaptive",
+                "preview", "cache", "instrument", "image_io", "batch")
+# Эти модули не должны загружаться при импорте
+FORBIDDEN = ("streamlit", "cv2", "PIL", "matplotlib", "tkinter")
+# Бюджет по умолчанию, мс. Основную часть занимает numpy (около 100 мс),
+# без которого обработка невозможна
+DEFAULT_BUDGET_MS = 250
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter_ns()
+import {module}
+t1 = time.perf_counter_ns()
+loaded = sorted(m for m in {forbidden!r} if m in sys.modules)
+print(json.dumps({{"ns": t1 - t0, "loaded": loaded}}))
+"""
+
+def measure(module, runs=5):
+    """
+    Медиана времени импорта (мс) и список загруженных запрещенных модулей.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = _PROBE.format(module=module, forbidden=FORBIDDEN)
+    times, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True,
+                             text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        times.append(result["ns"] / 1e6)
+        loaded.update(result["loaded"])
+    return statistics.median(times), sorted(loaded)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка времени импорта модулей обработки")
+    parser.add_argument("modules", nargs="*", default=list(CORE_MODULES))
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5, help="Запусков на модуль (берется медиана)")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        ms, loaded = measure(module, args.runs)
+        ok = ms <= args.budget_ms and not loaded
+        failed |= not ok
+        extra = f"  загружены: {', '.join(loaded)}" if loaded else ""
+        print(f"{'OK' if ok else 'ПРЕВЫШЕН':<9} {module:<12} {ms:7.1f} мс{extra}")
+    print(f"Бюджет: {args.budget_ms:.0f} мс")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
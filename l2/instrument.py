@@ -0,0 +1,138 @@
+"""
+Замеры времени и памяти по этапам обработки.
+
+    prof = Profiler(track_memory=True)
+    with prof.span("decode"):
+        img = decode(...)
+    prof.to_json()          # список замеров
+    prof.to_chrome_trace()  # формат Trace Event (chrome://tracing, Perfetto)
+
+Время - perf_counter_ns. Память - через tracemalloc (numpy и OpenCV
+сообщают ему о своих массивах): пик сверх уровня на входе в этап и
+объем, оставшийся занятым после этапа.
+
+Этапы можно открывать из нескольких потоков (вложенность считается в каждом
+потоке отдельно). tracemalloc при этом общий на процесс: память параллельных
+этапов смешивается, а сброс пика в одном потоке портит пик в другом. Поэтому
+у этапа, который шел одновременно с этапом другого потока, в замере стоит
+"peak_approx": True - его пик приблизительный. Для точных цифр память лучше
+замерять при последовательной обработке.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Общая точка отсчета: замеры разных профилировщиков лежат на одной шкале
+_ORIGIN_NS = time.perf_counter_ns()
+
+# Открытые этапы с замером памяти во всех потоках и профилировщиках
+# (tracemalloc один на процесс): по ним видно, что этапы шли одновременно
+_open_frames = []
+_open_lock = threading.Lock()
+
+class Profiler:
+    def __init__(self, track_memory=False):
+        self.track_memory = track_memory
+        self.records = []
+        # Открытые этапы (для вложенных замеров пика) - свои в каждом потоке
+        self._local = threading.local()
+        self._started_tracing = False
+
+    def _start_tracing(self):
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def stop(self):
+        """
+        Останавливает tracemalloc, если его запускал этот профилировщик.
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def span(self, name, **args):
+        self._start_tracing()
+        stack = self._stack()
+        frame = {"peak": 0, "thread": threading.get_ident(), "concurrent": False}
+        mem_start = 0
+        if self.track_memory:
+            with _open_lock:
+                if any(f["thread"] != frame["thread"] for f in _open_frames):
+                    for f in _open_frames:
+                        f["concurrent"] = True
+                    frame["concurrent"] = True
+                _open_frames.append(frame)
+            mem_start, peak = tracemalloc.get_traced_memory()
+            # Сброс пика ниже стер бы пик, до которого внешний этап дошел
+            # до начала этого - сохраняем его во внешнем этапе
+            if stack:
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+        stack.append(frame)
+        t0 = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            t1 = time.perf_counter_ns()
+            stack.pop()
+            record = {
+                "name": name,
+                "start_ns": t0 - _ORIGIN_NS,
+                "duration_ns": t1 - t0,
+                "thread": threading.get_ident(),
+                "depth": len(stack),
+            }
+            if self.track_memory:
+                mem_end, peak = tracemalloc.get_traced_memory()
+                # Вложенные этапы сбрасывают пик - учитываем их максимум
+                peak = max(peak, frame["peak"])
+                record["peak_bytes"] = max(0, peak - mem_start)
+                record["retained_bytes"] = mem_end - mem_start
+                if stack:
+                    parent = stack[-1]
+                    parent["peak"] = max(parent["peak"], peak)
+                with _open_lock:
+                    _open_frames.remove(frame)
+                if frame["concurrent"]:
+                    record["peak_approx"] = True
+            if args:
+                record["args"] = args
+            self.records.append(record)
+
+    def to_json(self, records=None):
+        return json.dumps(records if records is not None else self.records, indent=1, ensure_ascii=False)
+
+    def to_chrome_trace(self, records=None):
+        """
+        Trace Event Format: законченные события "X", время в микросекундах.
+        """
+        records = records if records is not None else self.records
+        pid = os.getpid()
+        events = []
+        for r in records:
+            args = dict(r.get("args", {}))
+            for key in ("peak_bytes", "retained_bytes", "peak_approx"):
+                if key in r:
+                    args[key] = r[key]
+            events.append({
+                "name": r["name"],
+                "cat": "l2",
+                "ph": "X",
+                "ts": r["start_ns"] / 1000.0,
+                "dur": r["duration_ns"] / 1000.0,
+                "pid": pid,
+                "tid": r["thread"],
+                "args": args,
+            })
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, ensure_ascii=False)
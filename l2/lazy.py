@@ -0,0 +1,29 @@
+"""
+Отложенный импорт тяжелых библиотек (OpenCV, PIL).
+
+    cv2 = lazy_import("cv2")
+    ...
+    cv2.add(a, b)   # сам модуль импортируется здесь, при первом обращении
+
+Модули обработки импортируются быстро и без побочных эффектов: процесс,
+которому нужен только parse_chain или порог Оцу по гистограмме, не платит
+за загрузку OpenCV. Найденные атрибуты запоминаются в заместителе, поэтому
+повторные обращения стоят как обычный поиск атрибута.
+"""
+import importlib
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        # Вызывается только для атрибутов, которых еще нет в заместителе
+        value = getattr(importlib.import_module(self._name), attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
+
+def lazy_import(name):
+    return LazyModule(name)
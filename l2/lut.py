@@ -0,0 +1,134 @@
+"""
+Конвейер поэлементных операций на таблице преобразования (LUT).
+
+Яркость, инверсия, линейное контрастирование, гамма и отсечение - это
+функции от значения пикселя (0..255). Любую их цепочку можно заранее
+свести в одну таблицу из 256 значений и применить к изображению за один
+проход uint8 -> uint8 (cv2.LUT), без промежуточных float-копий.
+
+Пример:
+    pipe = PointPipeline().brightness(20).contrast().gamma(0.8)
+    result = pipe.apply(image)
+"""
+import numpy as np
+
+from lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+
+# cv2.calcHist считает во float32, где целые точны только до 2^24,
+# поэтому большие изображения обрабатываются кусками такого размера
+_HIST_CHUNK = 1 << 24
+
+def value_histogram(image):
+    """
+    Гистограмма значений (все каналы вместе), 256 корзин.
+    """
+    flat = np.ascontiguousarray(image).reshape(-1)
+    hist = np.zeros(256, dtype=np.int64)
+    for start in range(0, flat.size, _HIST_CHUNK):
+        part = flat[start:start + _HIST_CHUNK].reshape(1, -1)
+        hist += cv2.calcHist([part], [0], None, [256], [0, 256]).reshape(-1).astype(np.int64)
+    return hist
+
+# --- Отдельные шаги: принимают текущую таблицу (int64) и маску присутствующих значений ---
+
+def _brightness(lut, present, value):
+    # Насыщение как у cv2.add / cv2.subtract
+    return np.clip(lut + value, 0, 255)
+
+def _invert(lut, present):
+    return 255 - lut
+
+def _contrast(lut, present):
+    # min/max берутся по значениям, которые реально есть в изображении
+    # после предыдущих шагов (как np.min/np.max в linear_contrasting)
+    values = lut[present]
+    if values.size == 0:
+        return lut
+    min_val = values.min()
+    max_val = values.max()
+    if max_val - min_val == 0:
+        return lut
+    res = ((lut.astype(float) - min_val) / (max_val - min_val)) * 255
+    return np.clip(res, 0, 255).astype(np.uint8).astype(np.int64)
+
+def _gamma(lut, present, gamma):
+    res = 255.0 * (lut / 255.0) ** gamma
+    return np.clip(np.round(res), 0, 255).astype(np.int64)
+
+def _clip(lut, present, low, high):
+    return np.clip(lut, low, high)
+
+class PointPipeline:
+    """
+    Цепочка поэлементных операций, компилируемая в одну LUT.
+    Методы добавления шагов возвращают self, чтобы их можно было сцеплять.
+    """
+
+    def __init__(self):
+        self.steps = []  # список (функция, аргументы)
+
+    def brightness(self, value):
+        self.steps.append((_brightness, (int(value),)))
+        return self
+
+    def invert(self):
+        self.steps.append((_invert, ()))
+        return self
+
+    def contrast(self):
+        self.steps.append((_contrast, ()))
+        return self
+
+    def gamma(self, gamma):
+        if gamma <= 0:
+            raise ValueError("Гамма должна быть положительной")
+        self.steps.append((_gamma, (float(gamma),)))
+        return self
+
+    def clip(self, low, high):
+        if not 0 <= low <= high <= 255:
+            raise ValueError("Нужно 0 <= low <= high <= 255")
+        self.steps.append((_clip, (int(low), int(high))))
+        return self
+
+    def depends_on_data(self):
+        """
+        True, если для компиляции нужна статистика изображения (контрастирование).
+        """
+        return any(func is _contrast for func, _ in self.steps)
+
+    def compile(self, image=None, hist=None):
+        """
+        Сводит все шаги в одну таблицу uint8[256].
+        Для контрастирования нужна гистограмма исходника (hist) или само изображение.
+        """
+        present = None
+        if self.depends_on_data():
+            if hist is None:
+                if image is None:
+                    raise ValueError("Для контрастирования нужно изображение или его гистограмма")
+                hist = value_histogram(image)
+            present = np.asarray(hist)[:256] > 0
+        lut = np.arange(256, dtype=np.int64)
+        for func, args in self.steps:
+            lut = func(lut, present, *args)
+        return lut.astype(np.uint8)
+
+    def apply(self, image, hist=None, out=None):
+        """
+        Применяет цепочку к uint8-изображению за один проход.
+        """
+        lut = self.compile(image=image, hist=hist)
+        return apply_lut(image, lut, out=out)
+
+def apply_lut(image, lut, out=None):
+    """
+    Один проход по изображению: out = lut[image] (для всех каналов одинаково).
+    """
+    if image.dtype != np.uint8:
+        raise ValueError("LUT применяется только к uint8-изображениям")
+    if out is None:
+        return cv2.LUT(image, lut)
+    return cv2.LUT(image, lut, dst=out)
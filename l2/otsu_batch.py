@@ -0,0 +1,181 @@
+"""
+Метод Оцу для пачки изображений одного размера (N, H, W).
+
+Все N гистограмм считаются одним вызовом bincount, все N порогов - одним
+проходом по матрице гистограмм (N, 256) через накопленные суммы, бинаризация -
+одной операцией над всем стеком. Цикла по изображениям на Python нет.
+
+Многоуровневый Оцу (2-3 порога) ищется динамическим программированием
+по таблице вкладов классов: O(N * 256^2) на каждый порог вместо перебора
+всех сочетаний порогов.
+"""
+import numpy as np
+
+# Ограничение на размер временных массивов (байт) - стек обрабатывается кусками
+_CHUNK_BYTES = 256 * 1024 * 1024
+
+def _chunks(n, per_item_bytes):
+    step = max(1, _CHUNK_BYTES // max(1, per_item_bytes))
+    for start in range(0, n, step):
+        yield start, min(n, start + step)
+
+def _check_stack(stack):
+    stack = np.asarray(stack)
+    if stack.ndim != 3 or stack.dtype != np.uint8:
+        raise ValueError("Ожидается стек uint8 формы (N, H, W)")
+    return stack
+
+def stack_histograms(stack):
+    """
+    Гистограммы всех изображений стека: матрица (N, 256).
+    Значения изображения i сдвигаются на 256 * i, и один bincount считает все сразу.
+    """
+    stack = _check_stack(stack)
+    n = stack.shape[0]
+    flat = stack.reshape(n, -1)
+    hists = np.empty((n, 256), dtype=np.int64)
+    for start, stop in _chunks(n, flat.shape[1] * 8):
+        part = flat[start:stop].astype(np.int64)
+        part += (np.arange(stop - start, dtype=np.int64) * 256)[:, None]
+        hists[start:stop] = np.bincount(part.ravel(), minlength=(stop - start) * 256).reshape(-1, 256)
+    return hists
+
+def otsu_thresholds(hists):
+    """
+    Пороги Оцу для каждой строки матрицы гистограмм (N, 256).
+    Та же формула и те же правила отбраковки, что и в cv2.threshold(THRESH_OTSU).
+    """
+    hists = np.atleast_2d(np.asarray(hists, dtype=np.float64))[:, :256]
+    total = hists.sum(axis=1, keepdims=True)
+    total[total == 0] = 1
+    p = hists / total
+    omega = np.cumsum(p, axis=1)
+    mu = np.cumsum(p * np.arange(256), axis=1)
+    q2 = 1.0 - omega
+
+    eps = np.finfo(np.float32).eps
+    valid = (np.minimum(omega, q2) >= eps) & (np.maximum(omega, q2) <= 1 - eps)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = (mu[:, -1:] * omega - mu) ** 2 / (omega * q2)
+    sigma = np.where(valid, sigma, 0.0)
+    res = np.argmax(sigma, axis=1)
+    # Однотонные изображения: порога нет, как и у OpenCV - 0
+    res[sigma.max(axis=1) <= 0] = 0
+    return res
+
+def threshold_stack(stack, thresholds, out=None):
+    """
+    Бинаризация стека: у каждого изображения свой порог (пиксель > T -> 255).
+    """
+    stack = _check_stack(stack)
+    thr = np.asarray(thresholds).reshape(-1, 1, 1)
+    if out is None:
+        out = np.empty(stack.shape, dtype=np.uint8)
+    np.greater(stack, thr, out=out)  # 0/1
+    np.multiply(out, 255, out=out)
+    return out
+
+def otsu_stack(stack, out=None):
+    """
+    Метод Оцу для всего стека: (пороги (N,), бинарный стек (N, H, W)).
+    """
+    thresholds = otsu_thresholds(stack_histograms(stack))
+    return thresholds, threshold_stack(stack, thresholds, out=out)
+
+# --- Многоуровневый Оцу ---
+
+def _class_terms(hists):
+    """
+    Таблица вкладов классов M[n, a, b] = S^2 / P для класса яркостей [a, b]
+    (P - доля пикселей, S - сумма i * p_i). Максимум суммы вкладов по классам
+    равносилен максимуму межклассовой дисперсии.
+    """
+    hists = np.asarray(hists, dtype=np.float64)
+    total = hists.sum(axis=1, keepdims=True)
+    total[total == 0] = 1
+    p = hists / total
+    n = p.shape[0]
+    P = np.zeros((n, 257))
+    S = np.zeros((n, 257))
+    np.cumsum(p, axis=1, out=P[:, 1:])
+    np.cumsum(p * np.arange(256), axis=1, out=S[:, 1:])
+
+    w = P[:, None, 1:] - P[:, :-1, None]   # [n, a, b] = P[b+1] - P[a]
+    s = S[:, None, 1:] - S[:, :-1, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m = np.where(w > 1e-12, s * s / w, 0.0)
+    # Классы с a > b не существуют
+    lower = np.tril(np.ones((256, 256), dtype=bool), k=-1)
+    m[:, lower] = -np.inf
+    return m
+
+def _multi_otsu_chunk(hists, classes):
+    m = _class_terms(hists)
+    n = m.shape[0]
+    idx = np.arange(256)
+
+    # best[a] - лучшая сумма для разбиения [a, 255] на j классов,
+    # choice[j][a] - конец первого из этих классов
+    best = m[:, :, 255].copy()
+    choices = []
+    for j in range(2, classes + 1):
+        # Первый класс [a, b], остальные j-1 классов - в [b+1, 255]
+        nxt = np.full((n, 256), -np.inf)
+        nxt[:, :255] = best[:, 1:]
+        cand = m + nxt[:, None, :]
+        # Для j-1 оставшихся классов нужно хотя бы j-1 значений справа от b
+        cand[:, :, idx > 255 - (j - 1)] = -np.inf
+        choice = np.argmax(cand, axis=2)
+        best = np.take_along_axis(cand, choice[:, :, None], axis=2)[:, :, 0]
+        choices.append(choice)
+
+    # Восстановление порогов, начиная с a = 0
+    res = np.empty((n, classes - 1), dtype=np.int64)
+    a = np.zeros(n, dtype=np.int64)
+    rows = np.arange(n)
+    for k, choice in enumerate(reversed(choices)):
+        b = choice[rows, a]
+        res[:, k] = b
+        a = b + 1
+    return res
+
+def multi_otsu_thresholds(hists, classes=3):
+    """
+    Пороги многоуровневого Оцу для каждой гистограммы: матрица (N, classes - 1).
+    Класс k - яркости (t[k-1], t[k]]; classes=3 - два порога, classes=4 - три.
+    """
+    if not 2 <= classes <= 4:
+        raise ValueError("Поддерживается от 2 до 4 классов (1-3 порога)")
+    hists = np.atleast_2d(np.asarray(hists))[:, :256]
+    n = hists.shape[0]
+    res = np.empty((n, classes - 1), dtype=np.int64)
+    # Таблица вкладов - 256x256 float64 на изображение
+    for start, stop in _chunks(n, 4 * 256 * 256 * 8):
+        res[start:stop] = _multi_otsu_chunk(hists[start:stop], classes)
+    return res
+
+def quantize_stack(stack, thresholds, out=None):
+    """
+    Разбиение стека на классы по порогам (N, K): класс k получает
+    яркость round(255 * k / K), т.е. 0 и 255 для крайних классов.
+    """
+    stack = _check_stack(stack)
+    thresholds = np.asarray(thresholds).reshape(stack.shape[0], -1)
+    k = thresholds.shape[1]
+    labels = np.zeros(stack.shape, dtype=np.uint8)
+    mask = np.empty(stack.shape, dtype=bool)
+    for j in range(k):
+        np.greater(stack, thresholds[:, j].reshape(-1, 1, 1), out=mask)
+        labels += mask
+    levels = np.round(np.arange(k + 1) * 255 / k).astype(np.uint8)
+    if out is None:
+        return levels[labels]
+    np.take(levels, labels, out=out)
+    return out
+
+def multi_otsu_stack(stack, classes=3, out=None):
+    """
+    Многоуровневый Оцу для стека: (пороги (N, classes - 1), стек с classes уровнями).
+    """
+    thresholds = multi_otsu_thresholds(stack_histograms(stack), classes)
+    return thresholds, quantize_stack(stack, thresholds, out=out)
@@ -0,0 +1,40 @@
+"""
+Пирамида уменьшенных копий изображения для быстрого предпросмотра.
+
+Пирамида строится один раз на загрузку: уровень 0 - оригинал, каждый
+следующий вдвое меньше (усреднение по площади). Пока пользователь двигает
+ползунки, операция выполняется на уровне размером с экран, а полное
+разрешение считается только по явному запросу.
+"""
+from lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+
+# Уровни меньше этого размера (по большей стороне) не строим
+MIN_LEVEL_SIDE = 256
+
+def build_pyramid(image, min_side=MIN_LEVEL_SIDE):
+    """
+    Список уровней [оригинал, 1/2, 1/4, ...] до стороны около min_side.
+    """
+    levels = [image]
+    while max(levels[-1].shape[:2]) // 2 >= min_side:
+        prev = levels[-1]
+        h, w = prev.shape[:2]
+        levels.append(cv2.resize(prev, ((w + 1) // 2, (h + 1) // 2), interpolation=cv2.INTER_AREA))
+    return levels
+
+def select_level(pyramid, max_side):
+    """
+    Самый мелкий уровень, который еще не меньше max_side (чтобы не растягивать).
+    """
+    for i in range(len(pyramid) - 1, -1, -1):
+        if max(pyramid[i].shape[:2]) >= max_side:
+            return i
+    return 0
+
+def scale_window(window, level):
+    """
+    Размер окна адаптивных методов на уменьшенном уровне (нечетный, не меньше 3).
+    """
+    return max(3, (window >> level) | 1)
@@ -0,0 +1,211 @@
+"""
+Функции обработки изображений (без интерфейса).
+Используются Streamlit-приложением (app.py), пакетной обработкой (batch.py),
+потоковой обработкой (stream.py) и их процессами-обработчиками.
+
+Импорт модуля не имеет побочных эффектов и не загружает OpenCV - он
+подгружается при первой операции (lazy.py). Время импорта проверяется
+скриптом import_budget.py.
+"""
+import numpy as np
+
+from buffers import default_pool
+from lazy import lazy_import
+from lut import PointPipeline, apply_lut
+from otsu_batch import otsu_thresholds
+
+cv2 = lazy_import("cv2")
+
+# --- ФУНКЦИИ ОБРАБОТКИ ---
+#
+# У всех операций есть необязательный параметр out - готовый массив для
+# результата (out=image - обработка на месте). Временные массивы берутся
+# из пула буферов (buffers.py), поэтому для кадров одного размера новых
+# выделений памяти нет.
+
+def linear_contrasting(image, out=None):
+    """
+    Линейное контрастирование (растяжение гистограммы).
+    Формула: g(x,y) = (f(x,y) - min) / (max - min) * 255
+    """
+    min_val = np.min(image)
+    max_val = np.max(image)
+
+    # Защита от деления на ноль (если изображение однотонное)
+    if max_val - min_val == 0:
+        if out is None:
+            return image
+        np.copyto(out, image)
+        return out
+
+    if image.dtype != np.uint8:
+        # Общий случай: через float
+        res = ((image.astype(float) - min_val) / (max_val - min_val)) * 255
+        if out is None:
+            return res.astype(np.uint8)
+        np.copyto(out, res, casting="unsafe")
+        return out
+
+    # Для uint8 та же формула считается один раз для каждого из 256 значений,
+    # а изображение проходится один раз без float-копии
+    lut = ((np.arange(256, dtype=float) - min_val) / (max_val - min_val)) * 255
+    lut = np.clip(lut, 0, 255).astype(np.uint8)
+    return apply_lut(image, lut, out=out)
+
+def pixel_operation_brightness(image, value, out=None):
+    """
+    Поэлементная операция: изменение яркости.
+    g(x,y) = f(x,y) + value
+    """
+    # Используем cv2.add для корректного насыщения (чтобы 250+10 стало 255, а не 4).
+    # Константа передается скаляром (по всем каналам), без массива размером с изображение
+    scalar = (abs(value),) * 4
+    if value >= 0:
+        res = cv2.add(image, scalar, dst=out)
+    else:
+        res = cv2.subtract(image, scalar, dst=out)
+    return res
+
+def pixel_operation_invert(image, out=None):
+    """
+    Поэлементная операция: негатив (инверсия).
+    g(x,y) = 255 - f(x,y)
+    """
+    return cv2.bitwise_not(image, dst=out)
+
+def _gray_view(image, pool):
+    """
+    Полутоновая версия: для цветного - во временном буфере из пула (его нужно вернуть).
+    """
+    if len(image.shape) == 3:
+        gray = pool.acquire(image.shape[:2], np.uint8)
+        cv2.cvtColor(image, cv2.COLOR_RGB2GRAY, dst=gray)
+        return gray, True
+    return image, False
+
+def global_threshold_manual(image, threshold, out=None, pool=None):
+    """
+    Метод 1: Простая глобальная пороговая обработка с ручным порогом.
+    """
+    pool = pool or default_pool
+    # Конвертируем в оттенки серого, если еще не
+    gray, borrowed = _gray_view(image, pool)
+
+    _, binary = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY, dst=out)
+    if borrowed:
+        pool.release(gray)
+    return binary
+
+def global_threshold_otsu(image, out=None, pool=None):
+    """
+    Метод 2: Метод Оцу (Otsu's method).
+    Автоматически ищет порог, минимизирующий внутриклассовую дисперсию.
+    """
+    pool = pool or default_pool
+    gray, borrowed = _gray_view(image, pool)
+
+    # thresh_val вернет вычисленный порог, binary - результат
+    thresh_val, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=out)
+    if borrowed:
+        pool.release(gray)
+    return thresh_val, binary
+
+def otsu_threshold(hist):
+    """
+    Порог Оцу по готовой гистограмме (256 корзин), без прохода по пикселям.
+    Совпадает с порогом, который вычисляет cv2.threshold(..., THRESH_OTSU).
+    """
+    return int(otsu_thresholds(hist)[0])
+
+# --- ЦЕПОЧКИ ОПЕРАЦИЙ ---
+
+# Имя операции -> (функция, есть ли числовой параметр)
+OPERATIONS = {
+    "brightness": (pixel_operation_brightness, True),
+    "invert": (pixel_operation_invert, False),
+    "contrast": (linear_contrasting, False),
+    "threshold": (global_threshold_manual, True),
+    "otsu": (global_threshold_otsu, False),
+}
+
+def parse_chain(spec):
+    """
+    Разбор строки вида "brightness=20,contrast,otsu" в список (имя, параметр).
+    """
+    chain = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, arg = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Неизвестная операция: {name}")
+        _, has_arg = OPERATIONS[name]
+        if has_arg and not arg:
+            raise ValueError(f"Операции {name} нужен параметр ({name}=N)")
+        if not has_arg and arg:
+            raise ValueError(f"Операция {name} не принимает параметров")
+        if has_arg:
+            try:
+                arg = int(arg)
+            except ValueError:
+                raise ValueError(f"Параметр операции {name} должен быть целым числом: {arg}") from None
+        chain.append((name, arg if has_arg else None))
+    if not chain:
+        raise ValueError("Пустая цепочка операций")
+    return chain
+
+# Операции, которые сводятся в одну LUT (см. lut.py)
+POINT_OPERATIONS = ("brightness", "invert", "contrast")
+
+def _point_pipeline(steps):
+    pipe = PointPipeline()
+    for name, arg in steps:
+        if name == "brightness":
+            pipe.brightness(arg)
+        elif name == "invert":
+            pipe.invert()
+        else:
+            pipe.contrast()
+    return pipe
+
+def apply_chain(image, chain, out=None, pool=None):
+    """
+    Последовательно применяет цепочку операций к изображению.
+    Подряд идущие поэлементные операции выполняются одним проходом по LUT.
+    Промежуточные результаты живут в буферах пула, последний шаг пишет в out.
+    """
+    pool = pool or default_pool
+    stages = []
+    i = 0
+    while i < len(chain):
+        j = i
+        while j < len(chain) and chain[j][0] in POINT_OPERATIONS:
+            j += 1
+        if j > i and image.dtype == np.uint8:
+            stages.append(("lut", _point_pipeline(chain[i:j])))
+            i = j
+        else:
+            stages.append(chain[i])
+            i += 1
+
+    res = image
+    for k, (name, arg) in enumerate(stages):
+        last = k == len(stages) - 1
+        shape = image.shape[:2] if name in ("threshold", "otsu") else res.shape
+        dst = out if last and out is not None else pool.acquire(shape, np.uint8)
+
+        if name == "lut":
+            new = arg.apply(res, out=dst)
+        elif name == "otsu":
+            # Оцу возвращает (порог, бинарное изображение)
+            new = global_threshold_otsu(res, out=dst, pool=pool)[1]
+        else:
+            func, has_arg = OPERATIONS[name]
+            new = func(res, arg, out=dst) if has_arg else func(res, out=dst)
+
+        if res is not image and res is not out:
+            pool.release(res)
+        res = new
+    return res
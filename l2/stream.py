@@ -0,0 +1,346 @@
+"""
+Потоковая обработка видео и последовательностей кадров.
+
+Три стадии в отдельных потоках, связанные ограниченными очередями:
+    чтение (декодирование) -> обработка (цепочка операций) -> запись (кодирование)
+OpenCV отпускает GIL, поэтому ввод-вывод и вычисления идут параллельно.
+Если запись не успевает, очереди заполняются и чтение ждет (обратное
+давление), так что память не растет. Кадров в работе (прочитан, но еще не
+записан) не больше max_in_flight: при нескольких обработчиках один
+медленный кадр задерживает запись следующих, и без этого ограничения они
+копились бы в памяти, ожидая его. Буферы кадров берутся из пула.
+
+Пример:
+    python stream.py input.mp4 -o result.mp4 --ops "contrast,otsu"
+    python stream.py frames/ -o out_frames/ --ops "brightness=30,invert" --workers 2
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from batch import collect_inputs
+from image_io import read_image
+from buffers import BufferPool
+from processing import apply_chain, parse_chain
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov")
+
+# Конец потока
+_END = object()
+
+class StageStats:
+    """
+    Время работы стадии на каждом кадре (в наносекундах).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.samples = []
+
+    def record(self, ns):
+        self.samples.append(ns)
+
+    def summary(self):
+        if not self.samples:
+            return {"frames": 0}
+        vals = sorted(self.samples)
+        n = len(vals)
+        return {
+            "frames": n,
+            "mean_ms": sum(vals) / n / 1e6,
+            "p50_ms": vals[n // 2] / 1e6,
+            "p95_ms": vals[min(n - 1, int(n * 0.95))] / 1e6,
+            "max_ms": vals[-1] / 1e6,
+        }
+
+# --- Источники кадров: генераторы RGB/серых кадров ---
+
+def video_frames(path, pool):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Не удалось открыть видео: {path}")
+    try:
+        buf = None
+        while True:
+            if buf is None:
+                ok, buf = cap.read()
+            else:
+                # Декодируем прямо в буфер из пула
+                ok, buf = cap.read(buf)
+            if not ok:
+                break
+            cv2.cvtColor(buf, cv2.COLOR_BGR2RGB, dst=buf)
+            yield buf
+            buf = pool.acquire(buf.shape, np.uint8)
+    finally:
+        cap.release()
+
+def video_fps(path, default=25.0):
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) if cap.isOpened() else 0
+    cap.release()
+    return fps if fps and fps > 0 else default
+
+def sequence_frames(paths):
+    for path in paths:
+        yield read_image(path)
+
+# --- Приемники ---
+
+class VideoSink:
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.writer = None
+
+    def write(self, frame):
+        if self.writer is None:
+            h, w = frame.shape[:2]
+            fourcc = cv2.VideoWriter_fourcc(*("XVID" if self.path.endswith(".avi") else "mp4v"))
+            self.writer = cv2.VideoWriter(self.path, fourcc, self.fps, (w, h), frame.ndim == 3)
+            if not self.writer.isOpened():
+                raise ValueError(f"Не удалось создать видео: {self.path}")
+        if frame.ndim == 3:
+            cv2.cvtColor(frame, cv2.COLOR_RGB2BGR, dst=frame)
+        self.writer.write(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+
+class FrameDirSink:
+    def __init__(self, path):
+        self.path = path
+        self.index = 0
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, frame):
+        if frame.ndim == 3:
+            cv2.cvtColor(frame, cv2.COLOR_RGB2BGR, dst=frame)
+        name = os.path.join(self.path, f"frame_{self.index:06d}.png")
+        if not cv2.imwrite(name, frame):
+            raise ValueError(f"Не удалось записать кадр: {name}")
+        self.index += 1
+
+    def close(self):
+        pass
+
+# --- Конвейер ---
+
+class StreamPipeline:
+    def __init__(self, frames, sink, chain, queue_size=8, workers=1, pool=None, recycle_input=False,
+                 max_in_flight=None):
+        self.frames = frames
+        # recycle_input: входные кадры выданы пулом (видео) и возвращаются в него после обработки
+        self.recycle_input = recycle_input
+        self.sink = sink
+        self.chain = chain
+        self.workers = workers
+        self.pool = pool or BufferPool()
+        self.decoded = queue.Queue(maxsize=queue_size)
+        self.processed = queue.Queue(maxsize=queue_size)
+        # По умолчанию - очередь и еще несколько кадров на каждый обработчик
+        self.max_in_flight = max_in_flight or queue_size + 4 * workers
+        self._in_flight = threading.Semaphore(self.max_in_flight)
+        self.max_pending = 0
+        self.stats = {name: StageStats(name) for name in ("decode", "process", "encode", "latency")}
+        self.error = None
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+
+    def _put(self, q, item):
+        # put с таймаутом, чтобы при ошибке в другой стадии не зависнуть навсегда
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _acquire_slot(self):
+        while not self._stop.is_set():
+            if self._in_flight.acquire(timeout=0.1):
+                return True
+        return False
+
+    def _fail(self, exc):
+        if self.error is None:
+            self.error = exc
+        self._stop.set()
+
+    def _decode(self):
+        try:
+            seq = 0
+            it = iter(self.frames)
+            while not self._stop.is_set():
+                # Ждем, пока запись освободит место (кадр seq - next_seq)
+                if not self._acquire_slot():
+                    return
+                t0 = time.perf_counter_ns()
+                frame = next(it, None)
+                if frame is None:
+                    break
+                self.stats["decode"].record(time.perf_counter_ns() - t0)
+                if not self._put(self.decoded, (seq, t0, frame)):
+                    return
+                seq += 1
+        except Exception as e:
+            self._fail(e)
+        finally:
+            for _ in range(self.workers):
+                self._put(self.decoded, _END)
+
+    def _process(self):
+        try:
+            while True:
+                item = self._get(self.decoded)
+                if item is _END:
+                    break
+                seq, t_start, frame = item
+                t0 = time.perf_counter_ns()
+                shape = frame.shape[:2] if _has_threshold(self.chain) else frame.shape
+                out = self.pool.acquire(shape, np.uint8)
+                apply_chain(frame, self.chain, out=out, pool=self.pool)
+                if self.recycle_input:
+                    self.pool.release(frame)
+                with self._stats_lock:
+                    self.stats["process"].record(time.perf_counter_ns() - t0)
+                if not self._put(self.processed, (seq, t_start, out)):
+                    return
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(self.processed, _END)
+
+    def _encode(self):
+        # Обработчиков может быть несколько: восстанавливаем порядок кадров
+        pending = {}
+        next_seq = 0
+        finished = 0
+        try:
+            while finished < self.workers:
+                item = self._get(self.processed)
+                if item is _END:
+                    if self._stop.is_set():
+                        return
+                    finished += 1
+                    continue
+                seq, t_start, frame = item
+                pending[seq] = (t_start, frame)
+                self.max_pending = max(self.max_pending, len(pending))
+                while next_seq in pending:
+                    t_start, frame = pending.pop(next_seq)
+                    t0 = time.perf_counter_ns()
+                    self.sink.write(frame)
+                    t1 = time.perf_counter_ns()
+                    self.stats["encode"].record(t1 - t0)
+                    self.stats["latency"].record(t1 - t_start)
+                    self.pool.release(frame)
+                    self._in_flight.release()
+                    next_seq += 1
+        except Exception as e:
+            self._fail(e)
+
+    def run(self):
+        threads = [threading.Thread(target=self._decode, name="decode")]
+        threads += [threading.Thread(target=self._process, name=f"process-{i}") for i in range(self.workers)]
+        threads.append(threading.Thread(target=self._encode, name="encode"))
+
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - start
+        self.sink.close()
+        if self.error is not None:
+            raise self.error
+
+        frames = len(self.stats["encode"].samples)
+        return {
+            "frames": frames,
+            "wall_s": wall,
+            "fps": frames / wall if wall > 0 else 0.0,
+            "stages": {name: s.summary() for name, s in self.stats.items()},
+            "max_in_flight": self.max_in_flight,
+            "max_pending": self.max_pending,
+            "pool": self.pool.stats(),
+        }
+
+def _has_threshold(chain):
+    return any(name in ("threshold", "otsu") for name, _ in chain)
+
+def print_report(report, stream=sys.stdout):
+    print(f"Кадров: {report['frames']}, время: {report['wall_s']:.2f} с, "
+          f"{report['fps']:.1f} кадр/с", file=stream)
+    for name, s in report["stages"].items():
+        if s["frames"]:
+            print(f"  {name:<8} среднее {s['mean_ms']:7.2f} мс  p50 {s['p50_ms']:7.2f}  "
+                  f"p95 {s['p95_ms']:7.2f}  макс {s['max_ms']:7.2f}", file=stream)
+    print(f"  буферов выделено: {report['pool']['allocations']}, "
+          f"переиспользовано: {report['pool']['reuses']}", file=stream)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Потоковая обработка видео / последовательности кадров")
+    parser.add_argument("input", help="Видеофайл, каталог с кадрами или glob-шаблон")
+    parser.add_argument("-o", "--out", required=True, help="Видеофайл (.mp4/.avi) или каталог для кадров")
+    parser.add_argument("--ops", required=True,
+                        help="Цепочка операций: brightness=N, invert, contrast, threshold=N, otsu")
+    parser.add_argument("--queue", type=int, default=8, help="Размер очередей между стадиями")
+    parser.add_argument("--workers", type=int, default=1, help="Число потоков обработки")
+    parser.add_argument("--in-flight", type=int,
+                        help="Кадров в работе не больше (по умолчанию очередь + 4 на обработчик)")
+    parser.add_argument("--fps", type=float, help="Частота кадров выходного видео")
+    parser.add_argument("--report", help="JSON-файл с отчетом о производительности")
+    args = parser.parse_args(argv)
+
+    try:
+        chain = parse_chain(args.ops)
+    except ValueError as e:
+        parser.error(str(e))
+
+    pool = BufferPool()
+    is_video = os.path.isfile(args.input) and args.input.lower().endswith(VIDEO_EXTENSIONS)
+    if is_video:
+        frames = video_frames(args.input, pool)
+        fps = args.fps or video_fps(args.input)
+    else:
+        paths = collect_inputs([args.input])
+        if not paths:
+            print("Нет входных кадров", file=sys.stderr)
+            return 1
+        frames = sequence_frames(paths)
+        fps = args.fps or 25.0
+
+    if args.out.lower().endswith(VIDEO_EXTENSIONS):
+        sink = VideoSink(args.out, fps)
+    else:
+        sink = FrameDirSink(args.out)
+
+    pipeline = StreamPipeline(frames, sink, chain, queue_size=args.queue, workers=args.workers,
+                              pool=pool, recycle_input=is_video, max_in_flight=args.in_flight)
+    report = pipeline.run()
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
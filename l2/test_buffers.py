@@ -0,0 +1,92 @@
+"""
+Пул буферов (buffers.py): после прогрева обработка кадров одного размера с
+out= не выделяет новых буферов.
+
+    python -m pytest test_buffers.py
+"""
+import numpy as np
+import pytest
+
+from adaptive import threshold_mean, threshold_niblack, threshold_sauvola
+from buffers import BufferPool
+from processing import apply_chain, global_threshold_manual, global_threshold_otsu, parse_chain
+
+FRAMES = 20
+
+def make_frame(shape, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, size=shape, dtype=np.uint8)
+
+def assert_no_allocations_after_warmup(run):
+    """
+    run() - обработка одного кадра. Первый вызов - прогрев, дальше пул
+    только отдает и принимает те же буферы.
+    """
+    pool = BufferPool()
+    first = run(pool).copy()
+    warm = pool.allocations
+    for _ in range(FRAMES):
+        result = run(pool)
+        assert pool.allocations == warm
+        np.testing.assert_array_equal(result, first)
+    return pool
+
+@pytest.mark.parametrize("spec", [
+    "brightness=30,contrast,invert,otsu",
+    "invert,threshold=100,invert",
+    "otsu,brightness=10",
+    "contrast",
+])
+@pytest.mark.parametrize("shape", [(240, 320, 3), (240, 320)])
+def test_apply_chain_reuses_buffers(spec, shape):
+    chain = parse_chain(spec)
+    frame = make_frame(shape)
+    out_shape = shape[:2] if any(name in ("threshold", "otsu") for name, _ in chain) else shape
+    out = np.empty(out_shape, dtype=np.uint8)
+
+    def run(pool):
+        result = apply_chain(frame, chain, out=out, pool=pool)
+        assert result is out
+        return result
+
+    pool = assert_no_allocations_after_warmup(run)
+    # Все выделенные буферы вернулись в пул
+    assert pool.stats()["free_buffers"] == pool.allocations
+
+@pytest.mark.parametrize("func", [
+    lambda image, out, pool: global_threshold_manual(image, 100, out=out, pool=pool),
+    lambda image, out, pool: global_threshold_otsu(image, out=out, pool=pool)[1],
+    lambda image, out, pool: threshold_mean(image, out=out, pool=pool),
+    lambda image, out, pool: threshold_niblack(image, out=out, pool=pool),
+    lambda image, out, pool: threshold_sauvola(image, out=out, pool=pool),
+], ids=["manual", "otsu", "mean", "niblack", "sauvola"])
+def test_thresholds_reuse_buffers(func):
+    frame = make_frame((120, 160, 3))
+    out = np.empty((120, 160), dtype=np.uint8)
+    assert_no_allocations_after_warmup(lambda pool: func(frame, out, pool))
+
+def test_acquire_release():
+    pool = BufferPool()
+    a = pool.acquire((4, 5))
+    assert a.shape == (4, 5) and a.dtype == np.uint8
+    pool.release(a)
+    assert pool.acquire((4, 5)) is a
+    assert pool.acquire((4, 5), np.float32).dtype == np.float32
+    assert pool.allocations == 2 and pool.reuses == 1
+
+def test_release_ignores_views():
+    pool = BufferPool()
+    pool.release(np.empty((4, 4), dtype=np.uint8)[1:])
+    pool.release(None)
+    assert pool.stats()["free_buffers"] == 0
+
+def test_max_free_bytes():
+    pool = BufferPool(max_free_bytes=100)
+    pool.release(np.empty(60, dtype=np.uint8))
+    pool.release(np.empty(60, dtype=np.uint8))
+    assert pool.stats()["free_buffers"] == 1 and pool.free_bytes == 60
+
+def test_borrow_returns_buffer():
+    pool = BufferPool()
+    with pool.borrow((3, 3)) as buf:
+        pass
+    assert pool.acquire((3, 3)) is buf
@@ -0,0 +1,159 @@
+"""
+Потайловая обработка больших изображений через отображение в память (memmap).
+
+Вход - .npy или "сырой" файл uint8 (для него нужна форма --shape H,W[,C]).
+Работа в два прохода:
+  1. Потоковый проход по полосам строк: 256-корзинная гистограмма
+     (из нее min/max для контрастирования и порог Оцу).
+  2. Запись результата полоса за полосой прямо в выходной memmap.
+Пиковая память ограничена размером одной полосы, а не всего изображения.
+
+Пример:
+    python tiled.py scan.npy -o scan_contrast.npy --op contrast
+    python tiled.py scan.raw --shape 40000,60000 -o mask.npy --op otsu
+"""
+import argparse
+import sys
+
+import cv2
+import numpy as np
+
+from lut import PointPipeline, value_histogram
+from processing import otsu_threshold, parse_chain
+
+# Примерный размер одной полосы в байтах
+DEFAULT_TILE_BYTES = 32 * 1024 * 1024
+
+def open_input(path, shape=None):
+    """
+    Открывает изображение только для чтения без загрузки в память.
+    """
+    if path.endswith(".npy"):
+        img = np.load(path, mmap_mode="r")
+    else:
+        if shape is None:
+            raise ValueError("Для сырого файла нужна форма --shape H,W[,C]")
+        img = np.memmap(path, dtype=np.uint8, mode="r", shape=tuple(shape))
+    if img.dtype != np.uint8:
+        raise ValueError(f"Поддерживается только uint8, а не {img.dtype}")
+    if img.ndim not in (2, 3):
+        raise ValueError("Ожидается изображение H x W или H x W x C")
+    return img
+
+def create_output(path, shape):
+    """
+    Создает выходной memmap (.npy с заголовком или сырой файл).
+    """
+    if path.endswith(".npy"):
+        return np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=shape)
+    return np.memmap(path, dtype=np.uint8, mode="w+", shape=shape)
+
+def tile_rows_for(img, tile_bytes=DEFAULT_TILE_BYTES):
+    row_bytes = int(np.prod(img.shape[1:]))
+    return max(1, tile_bytes // row_bytes)
+
+def iter_tiles(height, tile_rows):
+    """
+    Полосы строк [start, stop) по всей высоте.
+    """
+    for start in range(0, height, tile_rows):
+        yield start, min(start + tile_rows, height)
+
+def _to_gray(tile):
+    if tile.ndim == 3:
+        return cv2.cvtColor(np.ascontiguousarray(tile), cv2.COLOR_RGB2GRAY)
+    return tile
+
+def streaming_histogram(img, tile_rows, gray=False):
+    """
+    Первый проход: гистограмма значений (или яркости, gray=True) по полосам.
+    """
+    hist = np.zeros(256, dtype=np.int64)
+    for start, stop in iter_tiles(img.shape[0], tile_rows):
+        tile = img[start:stop]
+        if gray:
+            tile = _to_gray(tile)
+        # calcHist порциями: без временной intp-копии полосы (в 8 раз больше ее)
+        hist += value_histogram(tile)
+    return hist
+
+def tiled_point_pipeline(img, out, pipeline, tile_rows):
+    """
+    Поэлементные операции (в т.ч. контрастирование) с общей для всего изображения LUT.
+    """
+    hist = streaming_histogram(img, tile_rows) if pipeline.depends_on_data() else None
+    lut = pipeline.compile(hist=hist)
+    for start, stop in iter_tiles(img.shape[0], tile_rows):
+        # Пишем прямо в выходной memmap, без промежуточного буфера
+        cv2.LUT(np.asarray(img[start:stop]), lut, dst=out[start:stop])
+    return lut
+
+def tiled_threshold(img, out, threshold, tile_rows):
+    """
+    Бинаризация с глобальным порогом (как global_threshold_manual).
+    """
+    for start, stop in iter_tiles(img.shape[0], tile_rows):
+        gray = _to_gray(np.asarray(img[start:stop]))
+        cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY, dst=out[start:stop])
+
+def tiled_otsu(img, out, tile_rows):
+    """
+    Метод Оцу: порог по потоковой гистограмме, затем бинаризация по полосам.
+    """
+    thresh = otsu_threshold(streaming_histogram(img, tile_rows, gray=True))
+    tiled_threshold(img, out, thresh, tile_rows)
+    return thresh
+
+def _parse_shape(text):
+    return tuple(int(v) for v in text.split(","))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Потайловая обработка больших изображений (memmap)")
+    parser.add_argument("input", help="Файл .npy или сырой uint8")
+    parser.add_argument("-o", "--out", required=True, help="Выходной файл (.npy или сырой)")
+    parser.add_argument("--op", required=True,
+                        help="contrast | invert | brightness=N | threshold=N | otsu")
+    parser.add_argument("--shape", type=_parse_shape, help="Форма сырого входа: H,W или H,W,C")
+    parser.add_argument("--tile-rows", type=int, help="Строк в полосе (по умолчанию ~32 МБ на полосу)")
+    args = parser.parse_args(argv)
+
+    # Операция разбирается до создания выходного файла (синтаксис - как у
+    # --ops в batch.py), чтобы ошибка в ней не оставляла пустой файл
+    try:
+        chain = parse_chain(args.op)
+    except ValueError as e:
+        parser.error(str(e))
+    if len(chain) != 1:
+        parser.error("--op: нужна ровно одна операция")
+    name, arg = chain[0]
+
+    try:
+        img = open_input(args.input, args.shape)
+    except ValueError as e:
+        parser.error(str(e))
+    tile_rows = args.tile_rows or tile_rows_for(img)
+
+    if name in ("contrast", "invert", "brightness"):
+        pipe = PointPipeline()
+        if name == "contrast":
+            pipe.contrast()
+        elif name == "invert":
+            pipe.invert()
+        else:
+            pipe.brightness(arg)
+        out = create_output(args.out, img.shape)
+        tiled_point_pipeline(img, out, pipe, tile_rows)
+    elif name in ("threshold", "otsu"):
+        out = create_output(args.out, img.shape[:2])
+        if name == "otsu":
+            thresh = tiled_otsu(img, out, tile_rows)
+            print(f"Порог Оцу: {thresh}")
+        else:
+            tiled_threshold(img, out, arg, tile_rows)
+
+    out.flush()
+    print(f"Готово: {args.out} {out.shape}, полоса {tile_rows} строк")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
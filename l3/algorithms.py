@@ -0,0 +1,281 @@
+"""
+Алгоритмы растеризации без интерфейса.
+
+Каждый алгоритм возвращает список пикселей (x, y, color, alpha) - тот же
+формат, что раньше возвращали методы RasterizationApp. Модуль не зависит
+от Tk: его используют окно (lab.py), пакетные версии (raster_batch.py,
+как эталон) и замеры скорости (bench.py).
+"""
+import math
+
+def step_by_step(x1, y1, x2, y2):
+    points = []
+    if x1 == x2: # Вертикальная линия
+        start, end = min(y1, y2), max(y1, y2)
+        for y in range(start, end + 1):
+            points.append((x1, y, "black", 1.0))
+    else:
+        k = (y2 - y1) / (x2 - x1)
+        b = y1 - k * x1
+        start_x, end_x = min(x1, x2), max(x1, x2)
+        for x in range(start_x, end_x + 1):
+            y = k * x + b
+            points.append((x, round(y), "black", 1.0))
+    return points
+
+def dda(x1, y1, x2, y2):
+    points = []
+    length = max(abs(x2 - x1), abs(y2 - y1))
+    if length == 0:
+        return [(x1, y1, "black", 1.0)]
+
+    dx = (x2 - x1) / length
+    dy = (y2 - y1) / length
+
+    x, y = x1, y1
+    for _ in range(length + 1):
+        points.append((round(x), round(y), "black", 1.0))
+        x += dx
+        y += dy
+    return points
+
+def bresenham(x1, y1, x2, y2):
+    points = []
+    dx = abs(x2 - x1)
+    dy = abs(y2 - y1)
+    sx = 1 if x1 < x2 else -1
+    sy = 1 if y1 < y2 else -1
+    err = dx - dy
+
+    while True:
+        points.append((x1, y1, "black", 1.0))
+        if x1 == x2 and y1 == y2:
+            break
+        e2 = 2 * err
+        if e2 > -dy:
+            err -= dy
+            x1 += sx
+        if e2 < dx:
+            err += dx
+            y1 += sy
+    return points
+
+def bresenham_circle(xc, yc, r):
+    points = []
+    x = 0
+    y = r
+    d = 3 - 2 * r
+
+    def add_octants(cx, cy, x, y):
+        pts = [
+            (cx+x, cy+y), (cx-x, cy+y), (cx+x, cy-y), (cx-x, cy-y),
+            (cx+y, cy+x), (cx-y, cy+x), (cx+y, cy-x), (cx-y, cy-x)
+        ]
+        for p in pts:
+            points.append((p[0], p[1], "black", 1.0))
+
+    add_octants(xc, yc, x, y)
+    while y >= x:
+        x += 1
+        if d > 0:
+            y -= 1
+            d = d + 4 * (x - y) + 10
+        else:
+            d = d + 4 * x + 6
+        add_octants(xc, yc, x, y)
+    return points
+
+def wu(x1, y1, x2, y2):
+    # Бонус: Сглаживание (Исправленная версия)
+    points = []
+
+    def plot(x, y, c):
+        # c - это прозрачность от 0.0 до 1.0
+        # Если c выходит за границы из-за ошибок округления, ограничиваем
+        c = max(0.0, min(1.0, c))
+        points.append((x, y, "black", c))
+
+    # ВАЖНО: Используем math.floor вместо int для корректной работы
+    # с отрицательными координатами
+    def ipart(x): return math.floor(x)
+    def fpart(x): return x - math.floor(x)
+    def rfpart(x): return 1 - fpart(x)
+
+    steep = abs(y2 - y1) > abs(x2 - x1)
+    if steep:
+        x1, y1 = y1, x1
+        x2, y2 = y2, x2
+    if x1 > x2:
+        x1, x2 = x2, x1
+        y1, y2 = y2, y1
+
+    dx = x2 - x1
+    dy = y2 - y1
+    if dx == 0.0:
+        gradient = 1.0
+    else:
+        gradient = dy / dx
+
+    # --- Обработка первой точки ---
+    xend = round(x1)
+    yend = y1 + gradient * (xend - x1)
+    xgap = rfpart(x1 + 0.5)
+    xpxl1 = xend
+    ypxl1 = ipart(yend)
+
+    if steep:
+        plot(ypxl1,   xpxl1, rfpart(yend) * xgap)
+        plot(ypxl1+1, xpxl1,  fpart(yend) * xgap)
+    else:
+        plot(xpxl1, ypxl1,   rfpart(yend) * xgap)
+        plot(xpxl1, ypxl1+1,  fpart(yend) * xgap)
+
+    intery = yend + gradient
+
+    # --- Обработка второй точки ---
+    xend = round(x2)
+    yend = y2 + gradient * (xend - x2)
+    xgap = fpart(x2 + 0.5)
+    xpxl2 = xend
+    ypxl2 = ipart(yend)
+
+    if steep:
+        plot(ypxl2,   xpxl2, rfpart(yend) * xgap)
+        plot(ypxl2+1, xpxl2,  fpart(yend) * xgap)
+    else:
+        plot(xpxl2, ypxl2,   rfpart(yend) * xgap)
+        plot(xpxl2, ypxl2+1,  fpart(yend) * xgap)
+
+    # --- Основной цикл ---
+    for x in range(xpxl1 + 1, xpxl2):
+        if steep:
+            plot(ipart(intery),   x, rfpart(intery))
+            plot(ipart(intery)+1, x,  fpart(intery))
+        else:
+            plot(x, ipart(intery),   rfpart(intery))
+            plot(x, ipart(intery)+1,  fpart(intery))
+        intery = intery + gradient
+
+    return points
+
+def castle_pitteway(x1, y1, x2, y2):
+    """
+    Алгоритм Кастла-Питвея для линии.
+    Математически эквивалентен Брезенхему, но строится на логике 'средней точки'.
+    """
+    points = []
+
+    dx = abs(x2 - x1)
+    dy = abs(y2 - y1)
+
+    step_x = 1 if x2 > x1 else -1
+    step_y = 1 if y2 > y1 else -1
+
+    x = x1
+    y = y1
+
+    points.append((x, y, "black", 1.0))
+
+    # Случай 1: Ось X является ведущей (угол наклона <= 45 градусов)
+    if dy <= dx:
+        d = 2 * dy - dx  # Начальное значение решающей функции
+        for _ in range(dx):
+            if d >= 0:
+                y += step_y
+                d += 2 * (dy - dx)
+            else:
+                d += 2 * dy
+            x += step_x
+            points.append((x, y, "black", 1.0))
+
+    # Случай 2: Ось Y является ведущей (угол наклона > 45 градусов)
+    else:
+        d = 2 * dx - dy
+        for _ in range(dy):
+            if d >= 0:
+                x += step_x
+                d += 2 * (dx - dy)
+            else:
+                d += 2 * dx
+            y += step_y
+            points.append((x, y, "black", 1.0))
+
+    return points
+
+def run_slice(x1, y1, x2, y2):
+    """
+    Отрезок сериями (run-slice): за один шаг - целая серия пикселей в одной
+    строке (у крутых отрезков - в одном столбце). Пиксели те же, что у bresenham().
+    Возвращает (vertical, runs): runs - список (y, x_start, x_end) или, если
+    vertical, (x, y_start, y_end); границы включительно, start <= end.
+    """
+    dx = abs(x2 - x1)
+    dy = abs(y2 - y1)
+    vertical = dy > dx
+    if vertical:
+        # Крутой отрезок - тот же расчет с переставленными осями
+        x1, y1, x2, y2, dx, dy = y1, x1, y2, x2, dy, dx
+
+    if dy == 0:
+        return vertical, [(y1, min(x1, x2), max(x1, x2))]
+
+    step_x = 1 if x2 > x1 else -1
+    step_y = 1 if y2 > y1 else -1
+
+    # Серия k (k = 0..dy) у Брезенхема начинается с шага
+    # ceil((2k*dx - dx + 1) / (2dy)). От серии к серии числитель растет на
+    # 2dx = whole * 2dy + frac, поэтому начало сдвигается на whole или
+    # whole + 1 - решение принимается по остатку rem, без деления
+    den = 2 * dy
+    whole, frac = divmod(2 * dx, den)
+    start = -(-(dx + 1) // den)
+    rem = start * den - (dx + 1)
+
+    runs = []
+    y = y1
+    x = x1  # первый пиксель текущей серии
+    for _ in range(dy):
+        end = x1 + step_x * (start - 1)
+        runs.append((y, x, end) if step_x > 0 else (y, end, x))
+        x = end + step_x
+        y += step_y
+        start += whole
+        rem -= frac
+        if rem < 0:
+            start += 1
+            rem += den
+    # Последняя серия доходит до конца отрезка
+    runs.append((y, x, x2) if step_x > 0 else (y, x2, x))
+    return vertical, runs
+
+def run_pixels(vertical, runs):
+    """
+    Серии -> список (x, y) всех пикселей (для сравнения с bresenham()).
+    """
+    pixels = []
+    for a, start, end in runs:
+        for b in range(start, end + 1):
+            pixels.append((a, b) if vertical else (b, a))
+    return pixels
+
+def run_length(runs):
+    return sum(end - start + 1 for _, start, end in runs)
+
+# Режимы окна: имя -> функция
+ALGORITHMS = {
+    "step": step_by_step,
+    "dda": dda,
+    "bresenham": bresenham,
+    "castle": castle_pitteway,
+    "circle": bresenham_circle,
+    "wu": wu,
+}
+
+def run(mode, x1, y1, x2, y2=0):
+    """
+    Запуск режима с параметрами полей ввода окна: для окружности
+    (x1, y1) - центр, x2 - радиус, y2 не используется.
+    """
+    if mode == "circle":
+        return bresenham_circle(x1, y1, abs(x2))
+    return ALGORITHMS[mode](x1, y1, x2, y2)
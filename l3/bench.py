@@ -0,0 +1,216 @@
+"""
+Замер скорости алгоритмов растеризации без окна (для CI на сервере без дисплея).
+
+Все режимы (step, dda, bresenham, castle, runslice, wu, circle) прогоняются по
+сетке параметров: длины и углы наклона отрезков, радиусы окружностей. Для
+каждого случая - прогрев, затем серия повторов; каждый повтор - столько
+вызовов подряд, чтобы он длился не меньше --min-time (таймер не шумит).
+Результат - нс на пиксель: среднее и 95% доверительный интервал по повторам.
+С --store замеряется растеризация вместе с записью в PixelStore (пиксели
+через add_pixels, серии run-slice через add_spans).
+
+Пример:
+    python bench.py -o bench.json
+    python bench.py --quick --batch -o new.json --compare base.json --tolerance 0.25
+
+С --compare код возврата 1, если какой-то случай стал медленнее базового
+больше чем на tolerance (и интервалы не пересекаются).
+"""
+import argparse
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+
+import algorithms
+
+LINE_MODES = ("step", "dda", "bresenham", "castle", "runslice", "wu")
+MODES = LINE_MODES + ("circle",)
+
+# Квантиль t-распределения (0.975) по числу степеней свободы
+_T95 = {1: 12.71, 2: 4.30, 3: 3.18, 4: 2.78, 5: 2.57, 6: 2.45, 7: 2.36, 8: 2.31, 9: 2.26,
+        10: 2.23, 12: 2.18, 15: 2.13, 20: 2.09, 30: 2.04}
+
+def t95(dof):
+    if dof in _T95:
+        return _T95[dof]
+    smaller = [k for k in _T95 if k <= dof]
+    return _T95[max(smaller)] if dof <= 30 else 1.96
+
+def line_endpoints(length, angle_deg):
+    a = math.radians(angle_deg)
+    return 0, 0, round(length * math.cos(a)), round(length * math.sin(a))
+
+def cases(modes, lengths, angles, radii):
+    """
+    Список случаев: (режим, параметры для JSON, аргументы алгоритма).
+    """
+    result = []
+    for mode in modes:
+        if mode == "circle":
+            for r in radii:
+                result.append((mode, {"radius": r}, (0, 0, r, 0)))
+        else:
+            for length in lengths:
+                for angle in angles:
+                    result.append((mode, {"length": length, "angle": angle},
+                                   line_endpoints(length, angle)))
+    return result
+
+def measure(func, pixels, warmup, repeats, min_time_ns):
+    """
+    Серия замеров одного случая -> статистика в нс на пиксель.
+    """
+    for _ in range(warmup):
+        func()
+    # Подбор числа вызовов в одном повторе
+    inner = 1
+    while True:
+        t0 = time.perf_counter_ns()
+        for _ in range(inner):
+            func()
+        elapsed = time.perf_counter_ns() - t0
+        if elapsed >= min_time_ns or inner >= 1 << 20:
+            break
+        inner *= 2
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter_ns()
+        for _ in range(inner):
+            func()
+        samples.append((time.perf_counter_ns() - t0) / (inner * pixels))
+    mean = statistics.fmean(samples)
+    half = t95(repeats - 1) * statistics.stdev(samples) / math.sqrt(repeats) if repeats > 1 else 0.0
+    return {
+        "pixels": pixels,
+        "calls_per_repeat": inner,
+        "repeats": repeats,
+        "ns_per_pixel": round(mean, 3),
+        "ci95": [round(mean - half, 3), round(mean + half, 3)],
+        "median": round(statistics.median(samples), 3),
+        "min": round(min(samples), 3),
+    }
+
+def loop_call(mode, args, store=False):
+    """
+    Вызов пошаговой версии -> (функция без аргументов, число пикселей).
+    """
+    if mode == "runslice":
+        call = lambda: algorithms.run_slice(*args)
+        pixels = algorithms.run_length(call()[1])
+    else:
+        call = lambda: algorithms.run(mode, *args)
+        pixels = len(call())
+    if not store:
+        return call, pixels
+
+    from pixel_store import PixelStore
+
+    def call_and_store():
+        pixels = PixelStore()
+        if mode == "runslice":
+            vertical, runs = algorithms.run_slice(*args)
+            pixels.add_spans(runs, 0, vertical=vertical)
+        else:
+            pixels.add_pixels(algorithms.run(mode, *args))
+    return call_and_store, pixels
+
+def run_cases(case_list, warmup, repeats, min_time_ns, batch_size=0, store=False):
+    results = []
+    for mode, params, args in case_list:
+        call, pixels = loop_call(mode, args, store)
+        stats = measure(call, pixels, warmup, repeats, min_time_ns)
+        impl = "loop+store" if store else "loop"
+        results.append({"impl": impl, "mode": mode, "params": params, **stats})
+
+        if batch_size and mode in ("step", "dda", "bresenham", "castle"):
+            import numpy as np
+            from raster_batch import rasterize_lines
+
+            segments = np.tile(np.array(args, dtype=np.int64), (batch_size, 1))
+            batch_call = lambda: rasterize_lines(segments, mode)
+            stats = measure(batch_call, len(batch_call()[0]), warmup, repeats, min_time_ns)
+            results.append({"impl": "batch", "mode": mode, "params": params,
+                            "segments": batch_size, **stats})
+    return results
+
+def _key(r):
+    return (r["impl"], r["mode"], tuple(sorted(r["params"].items())))
+
+def compare(results, baseline, tolerance):
+    """
+    Список регрессий: случаи, ставшие медленнее базовых больше чем на tolerance.
+    """
+    base = {_key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = base.get(_key(r))
+        if b is None:
+            continue
+        ratio = r["ns_per_pixel"] / b["ns_per_pixel"]
+        if ratio > 1 + tolerance and r["ci95"][0] > b["ci95"][1]:
+            regressions.append((r, b, ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер скорости алгоритмов растеризации")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--angles", type=float, nargs="+", default=[0, 15, 30, 45, 60, 75, 90])
+    parser.add_argument("--radii", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--min-time", type=float, default=5.0, help="Мин. длительность повтора, мс")
+    parser.add_argument("--quick", action="store_true", help="Короткий прогон (для CI)")
+    parser.add_argument("--store", action="store_true", help="Замер вместе с записью в PixelStore")
+    parser.add_argument("--batch", type=int, nargs="?", const=1000, default=0,
+                        help="Также пакетные версии (raster_batch.py) на N одинаковых отрезках")
+    parser.add_argument("-o", "--output", help="JSON с результатами")
+    parser.add_argument("--compare", help="JSON базового прогона для поиска регрессий")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Допустимое замедление (0.3 = 30%%)")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.lengths, args.angles, args.radii = [100], [0, 30, 45, 90], [100]
+        args.repeats, args.min_time = min(args.repeats, 5), min(args.min_time, 2.0)
+
+    case_list = cases(args.modes, args.lengths, args.angles, args.radii)
+    results = run_cases(case_list, args.warmup, args.repeats, int(args.min_time * 1e6),
+                        args.batch, args.store)
+
+    for r in results:
+        params = ", ".join(f"{k}={v:g}" for k, v in r["params"].items())
+        lo, hi = r["ci95"]
+        print(f"{r['impl']:<10} {r['mode']:<9} {params:<22} пикселей {r['pixels']:>7}  "
+              f"{r['ns_per_pixel']:9.2f} нс/пиксель  [{lo:.2f}; {hi:.2f}]")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "system": platform.system(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "warmup": args.warmup,
+            "repeats": args.repeats,
+            "min_time_ms": args.min_time,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for r, b, ratio in regressions:
+            print(f"РЕГРЕССИЯ {r['impl']} {r['mode']} {r['params']}: "
+                  f"{b['ns_per_pixel']:.2f} -> {r['ns_per_pixel']:.2f} нс/пиксель (x{ratio:.2f})")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
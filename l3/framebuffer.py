@@ -0,0 +1,155 @@
+"""
+Отрисовка вида растеризатора в буфер кадра (массив NumPy RGB).
+
+Вместо тысяч элементов холста Tk (линия на каждую линию сетки и
+прямоугольник на каждый пиксель) кадр собирается в массиве (H, W, 3) и
+передается на холст одной картинкой (PPM -> tk.PhotoImage). Стоимость
+кадра - O(ширина * высота окна), а не число нарисованных пикселей:
+пиксели сначала раскладываются по сетке видимых клеток, а затем сетка
+увеличивается до экранного размера выборкой строк и столбцов.
+
+Геометрия та же, что в lab.py: клетка (px, py) - экранный прямоугольник
+    столбцы [cx + px*s, cx + (px+1)*s), строки [cy - (py+1)*s, cy - py*s),
+где (cx, cy) - экранный центр координат, s - размер клетки.
+"""
+import numpy as np
+
+BACKGROUND = (255, 255, 255)
+GRID_COLOR = (0xEE, 0xEE, 0xEE)
+AXIS_COLOR = (0, 0, 0)
+# Сетка рисуется, только если клетка не мельче этого размера (как в lab.py)
+MIN_GRID_SIZE = 5
+
+_NAMED_COLORS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "red": (255, 0, 0),
+    "green": (0, 128, 0),
+    "blue": (0, 0, 255),
+    "gray": (190, 190, 190),
+    "grey": (190, 190, 190),
+}
+
+def parse_color(color):
+    """
+    Цвет Tk ("#rgb", "#rrggbb" или имя) -> (r, g, b).
+    """
+    if color.startswith("#"):
+        digits = color[1:]
+        n = len(digits) // 3
+        if n not in (1, 2, 4) or len(digits) != 3 * n:
+            raise ValueError(f"Неизвестный цвет: {color}")
+        # Как в Tk: цифры - старшие биты канала (#3a7 = #30a070)
+        values = (int(digits[i * n:(i + 1) * n], 16) for i in range(3))
+        return tuple(v << 4 if n == 1 else v >> (4 * n - 8) for v in values)
+    try:
+        return _NAMED_COLORS[color.lower()]
+    except KeyError:
+        raise ValueError(f"Неизвестный цвет: {color}") from None
+
+class View:
+    """
+    Геометрия окна просмотра: размер холста, размер клетки и сдвиг центра.
+    """
+
+    def __init__(self, width, height, pixel_size, offset_x=0, offset_y=0):
+        self.width = max(1, width)
+        self.height = max(1, height)
+        self.pixel_size = pixel_size
+        self.cx = width // 2 + offset_x
+        self.cy = height // 2 + offset_y
+
+    def column_cells(self):
+        """
+        Номер клетки px для каждого столбца экрана.
+        """
+        return (np.arange(self.width) - self.cx) // self.pixel_size
+
+    def row_cells(self):
+        """
+        Номер клетки py для каждой строки экрана (y вверх).
+        """
+        return (self.cy - 1 - np.arange(self.height)) // self.pixel_size
+
+    def visible_cells(self):
+        """
+        Видимые клетки: (px_min, px_max, py_min, py_max), границы включительно.
+        """
+        s = self.pixel_size
+        return ((0 - self.cx) // s, (self.width - 1 - self.cx) // s,
+                (self.cy - self.height) // s, (self.cy - 1) // s)
+
+    def grid_columns(self):
+        return np.arange(self.cx % self.pixel_size, self.width, self.pixel_size)
+
+    def grid_rows(self):
+        return np.arange(self.cy % self.pixel_size, self.height, self.pixel_size)
+
+def _draw_grid(fb, view):
+    fb[:, view.grid_columns()] = GRID_COLOR
+    fb[view.grid_rows(), :] = GRID_COLOR
+    # Оси - линии толщиной 2, как create_line(..., width=2)
+    if 0 <= view.cx < view.width:
+        fb[:, max(0, view.cx - 1):view.cx + 1] = AXIS_COLOR
+    if 0 <= view.cy < view.height:
+        fb[max(0, view.cy - 1):view.cy + 1, :] = AXIS_COLOR
+
+def render_base(view, show_grid=True, out=None):
+    """
+    Кадр (H, W, 3) uint8 без пикселей: фон и сетка с осями.
+    """
+    fb = out if out is not None else np.empty((view.height, view.width, 3), dtype=np.uint8)
+    fb[:] = BACKGROUND
+    if show_grid and view.pixel_size >= MIN_GRID_SIZE:
+        _draw_grid(fb, view)
+    return fb
+
+def render(view, xs, ys, rgb, show_grid=True, out=None):
+    """
+    Кадр (H, W, 3) uint8: фон, сетка с осями и клетки нарисованных пикселей.
+    """
+    fb = render_base(view, show_grid, out)
+    draw_cells(fb, view, xs, ys, rgb)
+    return fb
+
+def last_per_cell(flat):
+    """
+    Номера последних записей каждой клетки (flat - плоские номера клеток).
+    При записи по индексам с повторами NumPy не обещает, какая запись
+    останется, поэтому "последний сверху" выбирается заранее.
+    """
+    _, first_reversed = np.unique(flat[::-1], return_index=True)
+    return len(flat) - 1 - first_reversed
+
+def draw_cells(fb, view, xs, ys, rgb):
+    """
+    Клетки нарисованных пикселей поверх кадра fb. Пиксели, попавшие в одну
+    клетку, перекрываются по порядку (последний сверху).
+    """
+    px0, px1, py0, py1 = view.visible_cells()
+    inside = (xs >= px0) & (xs <= px1) & (ys >= py0) & (ys <= py1)
+    if not inside.any():
+        return fb
+    # Сетка видимых клеток: строка 0 - верхняя (py1); запись по плоскому
+    # номеру клетки дешевле пары индексов
+    ncols = px1 - px0 + 1
+    cells = np.zeros((py1 - py0 + 1, ncols, 3), dtype=np.uint8)
+    filled = np.zeros(cells.shape[:2], dtype=bool)
+    flat = (py1 - ys[inside]) * ncols + (xs[inside] - px0)
+    last = last_per_cell(flat)
+    cells.reshape(-1, 3)[flat[last]] = rgb[inside][last]
+    filled.reshape(-1)[flat] = True
+
+    # Увеличение до экрана: выбор строк, затем столбцов
+    screen_rows = py1 - view.row_cells()
+    screen_cols = view.column_cells() - px0
+    mask = filled[screen_rows][:, screen_cols]
+    np.copyto(fb, cells[screen_rows][:, screen_cols], where=mask[:, :, None])
+    return fb
+
+def to_ppm(fb):
+    """
+    Кадр -> двоичный PPM (P6) для tk.PhotoImage(data=..., format="PPM").
+    """
+    h, w = fb.shape[:2]
+    return b"P6 %d %d 255\n" % (w, h) + np.ascontiguousarray(fb).tobytes()
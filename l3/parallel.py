@@ -0,0 +1,164 @@
+"""
+Параллельный вывод сцены без окна: картинка режется на плитки, плитки
+рисуются в пуле процессов.
+
+Фигуры раскладываются по плиткам по своим границам (scene.record_bounds, у
+Ву - вместе со вторым пикселем пары); фигура на стыке попадает в несколько
+плиток. Процесс рисует фигуры своей плитки целиком, в исходном порядке и
+теми же порциями, что scene.render_scene, оставляет только пиксели плитки и
+копирует плитку в общую картинку (multiprocessing.shared_memory).
+
+Плитки не пересекаются, а наложение "поверх" в клетке зависит только от
+записей этой клетки. Поэтому картинка совпадает с последовательной байт в
+байт - в том числе смешивание пикселей Ву на границах плиток - и не зависит
+ни от числа процессов, ни от того, в каком порядке плитки готовы.
+
+    python scene.py big.l3b -o big.png --jobs 8
+
+Самопроверка (совпадение с последовательным выводом на разных плитках):
+
+    python parallel.py
+"""
+import os
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from framebuffer import BACKGROUND
+from pixel_store import Palette
+from raster_batch import steps
+from scene import composite, rasterize, record_bounds, scene_bbox
+
+# Сторона плитки в пикселях: фигуры сцен короткие, и на стыки приходится
+# немного повторной растеризации, а плиток хватает на десятки процессов
+TILE = 256
+
+def bin_records(records, bbox, tile=TILE):
+    """
+    Раскладка фигур по плиткам картинки bbox. Плитки нумеруются по строкам
+    сверху вниз (как в картинке), в строке - слева направо.
+    -> (столбцов, строк, index, starts): номера фигур плитки t -
+    index[starts[t]:starts[t + 1]], по возрастанию.
+    """
+    x_min, y_min, x_max, y_max = bbox
+    cols = (x_max - x_min) // tile + 1
+    rows = (y_max - y_min) // tile + 1
+    lo_x, lo_y, hi_x, hi_y = record_bounds(records)
+    c0, c1 = (lo_x - x_min) // tile, (hi_x - x_min) // tile
+    r0, r1 = (y_max - hi_y) // tile, (y_max - lo_y) // tile
+    keep = np.flatnonzero((c1 >= 0) & (c0 < cols) & (r1 >= 0) & (r0 < rows))
+    c0, c1 = np.clip(c0[keep], 0, cols - 1), np.clip(c1[keep], 0, cols - 1)
+    r0, r1 = np.clip(r0[keep], 0, rows - 1), np.clip(r1[keep], 0, rows - 1)
+
+    # Каждая фигура - во все плитки прямоугольника c0..c1 x r0..r1
+    width = c1 - c0 + 1
+    counts = width * (r1 - r0 + 1)
+    k = steps(counts)
+    width = np.repeat(width, counts)
+    tiles = (np.repeat(r0, counts) + k // width) * cols + np.repeat(c0, counts) + k % width
+    order = np.argsort(tiles, kind="stable")
+    index = np.repeat(keep, counts)[order]
+    starts = np.searchsorted(tiles[order], np.arange(cols * rows + 1))
+    return cols, rows, index, starts
+
+def _render_tile(task):
+    """
+    Рисование одной плитки (в процессе пула) и копирование в общую картинку.
+    """
+    name, shape, bbox, rect, records, chunk_ids = task
+    x0, y0, x1, y1 = rect
+    tile = np.empty((y1 - y0 + 1, x1 - x0 + 1, 3), dtype=np.uint8)
+    tile[:] = BACKGROUND
+    palette = Palette()
+    # Фигуры плитки растеризуются одним пакетом, а накладываются теми же
+    # порциями, что у последовательного вывода: смешивание в клетке
+    # округляется после каждой порции
+    xs, ys, prim, alpha = rasterize(records)
+    color = palette.indices(records["rgb"])[prim]
+    bounds = np.flatnonzero(np.diff(chunk_ids[prim])) + 1
+    pixels = 0
+    for part in zip(*(np.split(a, bounds) for a in (xs, ys, color, alpha))):
+        pixels += composite(tile, rect, *part, palette)
+
+    shm = shared_memory.SharedMemory(name=name)
+    image = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    row, col = bbox[3] - y1, x0 - bbox[0]
+    image[row:row + tile.shape[0], col:col + tile.shape[1]] = tile
+    del image
+    shm.close()
+    return pixels
+
+def render_scene_parallel(chunks, bbox=None, jobs=None, tile=TILE):
+    """
+    То же, что scene.render_scene, но плитками в jobs процессах (None - по
+    числу ядер). Сцена читается в память целиком (20 байт на фигуру).
+    -> (картинка, фигур, пикселей в картинке).
+    """
+    chunks = [records for records in chunks if len(records)]
+    if not chunks:
+        return np.full((1, 1, 3), BACKGROUND, dtype=np.uint8), 0, 0
+    records = np.concatenate(chunks)
+    chunk_ids = np.repeat(np.arange(len(chunks)), [len(c) for c in chunks])
+    bbox = tuple(int(v) for v in (scene_bbox(records) if bbox is None else bbox))
+    x_min, y_min, x_max, y_max = bbox
+    shape = (y_max - y_min + 1, x_max - x_min + 1, 3)
+    jobs = jobs or os.cpu_count() or 1
+
+    cols, rows, index, starts = bin_records(records, bbox, tile)
+    shm = shared_memory.SharedMemory(create=True, size=shape[0] * shape[1] * 3)
+    try:
+        image = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        image[:] = BACKGROUND
+        tasks = []
+        for t in range(cols * rows):
+            sel = index[starts[t]:starts[t + 1]]
+            if len(sel) == 0:
+                continue
+            row, col = divmod(t, cols)
+            x0, y1 = x_min + col * tile, y_max - row * tile
+            rect = (x0, max(y1 - tile + 1, y_min), min(x0 + tile - 1, x_max), y1)
+            tasks.append((shm.name, shape, bbox, rect, records[sel], chunk_ids[sel]))
+        # Сначала самые загруженные плитки - меньше простоя в конце
+        tasks.sort(key=lambda task: -len(task[4]))
+
+        if jobs == 1:
+            pixels = sum(map(_render_tile, tasks))
+        else:
+            with Pool(jobs) as pool:
+                pixels = sum(pool.imap_unordered(_render_tile, tasks))
+        result = image.copy()
+        del image
+    finally:
+        shm.close()
+        shm.unlink()
+    return result, len(records), pixels
+
+# --- Самопроверка ---
+
+def _selfcheck(count=4000, seed=0):
+    import scene
+
+    records = np.concatenate(list(scene.random_scene(count, seed, extent=150)))
+    records["rgb"][::5] = (255, 0, 0)
+    records["rgb"][::7] = (0, 90, 200)
+    # Окружности радиуса 0 на стыках плиток 7 x 7: их пиксели (xc ± 1,
+    # yc ± 1) лежат в соседних плитках
+    zero = records[:12].copy()
+    zero["algo"] = scene._CODES["circle"]
+    zero["x1"], zero["y1"] = np.arange(12) * 7, np.arange(12) * 7 - 1
+    zero["x2"] = 0
+    records = np.concatenate([zero, records])
+    chunks = [records[i:i + 1000] for i in range(0, len(records), 1000)]
+
+    failed = 0
+    for bbox in (None, (-50, -37, 123, 99)):
+        reference, _, ref_pixels = scene.render_scene(chunks, bbox)
+        for jobs, tile in ((1, 7), (2, 7), (2, 64), (3, TILE)):
+            image, _, pixels = render_scene_parallel(chunks, bbox, jobs, tile)
+            bad = int((image != reference).any(axis=2).sum()) + abs(pixels - ref_pixels)
+            failed += bad
+            print(f"bbox {bbox}, процессов {jobs}, плитка {tile}: расхождений {bad}")
+    return failed
+
+if __name__ == "__main__":
+    raise SystemExit(1 if _selfcheck() else 0)
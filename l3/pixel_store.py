@@ -0,0 +1,373 @@
+"""
+Компактное хранилище нарисованных пикселей.
+
+Вместо списка кортежей (x, y, color, alpha) - плитки 64 x 64 клетки, в
+каждой три массива по занятым клеткам (отсортированы по номеру клетки):
+    cell  - номер клетки в плитке (uint16),
+    color - номер цвета в палитре (uint16),
+    alpha - непрозрачность 0..255 (uint8),
+то есть 5 байт на клетку против сотни с лишним байт на кортеж.
+
+Повторная запись в занятую клетку не добавляет запись, а смешивается с ней
+по правилу "поверх" (over): a = a_new + a_old * (1 - a_new), цвет - среднее,
+взвешенное по вкладам. Так складываются перекрывающиеся фигуры и пары
+пикселей Ву на концах отрезка. Непрозрачный пиксель просто заменяет старый.
+
+Плитки одновременно служат пространственным индексом: query() отдает
+только плитки, пересекающие видимый прямоугольник. clear() - O(1).
+
+Залитые фигуры (fill.py) хранятся спанами (y, x_start, x_end) - одна
+запись на строку фигуры, а не на клетку; серии отрезков run_slice()
+(algorithms.py) - так же, по строкам или по столбцам. Хранилище - список слоев в
+порядке рисования: слой плиток (TileLayer) или слой спанов (SpanLayer).
+Новые пиксели дописываются в последний слой плиток, новые спаны - в
+последний слой спанов; если последний слой другого типа, заводится новый.
+query() разворачивает спаны только в видимом прямоугольнике и смешивает
+слои по тому же правилу "поверх".
+"""
+import numpy as np
+
+from framebuffer import BACKGROUND, parse_color
+from raster_batch import steps
+
+# Плитка 2^6 x 2^6 = 64 x 64 клетки
+TILE_SHIFT = 6
+TILE_MASK = (1 << TILE_SHIFT) - 1
+# Смещение номеров плиток, чтобы упаковать пару (tx, ty) в одно int64
+_KEY_BIAS = 1 << 30
+
+class Palette:
+    """
+    Цвета (r, g, b) и их номера. Строки Tk разбираются один раз.
+    """
+
+    def __init__(self):
+        self.rgb = np.zeros((0, 3), dtype=np.uint8)
+        self._index = {}  # (r, g, b) или строка -> номер
+
+    def index(self, color):
+        if color in self._index:
+            return self._index[color]
+        rgb = parse_color(color) if isinstance(color, str) else tuple(int(c) for c in color)
+        if rgb not in self._index:
+            self._index[rgb] = len(self.rgb)
+            self.rgb = np.vstack([self.rgb, np.array([rgb], dtype=np.uint8)])
+        self._index[color] = self._index[rgb]
+        return self._index[rgb]
+
+    def indices(self, rgb):
+        """
+        Номера для массива цветов (N, 3); новые цвета добавляются.
+        """
+        packed = (rgb[:, 0].astype(np.int64) << 16) | (rgb[:, 1].astype(np.int64) << 8) | rgb[:, 2]
+        unique, inverse = np.unique(packed, return_inverse=True)
+        table = np.array([self.index(((v >> 16) & 255, (v >> 8) & 255, v & 255))
+                          for v in unique.tolist()], dtype=np.uint16)
+        return table[inverse]
+
+def _pack(tx, ty):
+    return (tx + _KEY_BIAS) << 32 | (ty + _KEY_BIAS)
+
+def _tile_keys(xs, ys):
+    return _pack(xs >> TILE_SHIFT, ys >> TILE_SHIFT)
+
+def _unpack_key(key):
+    return (key >> 32) - _KEY_BIAS, (key & 0xFFFFFFFF) - _KEY_BIAS
+
+def _groups(key):
+    """
+    Устойчивая сортировка по номеру клетки (int64) - порядок рисования внутри
+    клетки сохраняется, а уже упорядоченные старые записи timsort сливает с
+    новыми почти за линейное время. -> (порядок, признак первой записи клетки).
+    """
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = key[1:] != key[:-1]
+    return order, first
+
+def _over(first, color, alpha, palette_rgb):
+    """
+    Смешивание "поверх" записей каждой клетки по порядку. Записи отсортированы
+    по клеткам (first - начало клетки), color - номера в палитре, alpha - 0..255.
+    -> (base, rgb, alpha): base - нижняя видимая запись клетки, rgb и alpha
+    (0.0..1.0) - результат по одной на клетку, float.
+    """
+    n = len(first)
+    idx = np.arange(n)
+    group = np.cumsum(first) - 1
+    # Все, что лежит под последней непрозрачной записью клетки, не видно -
+    # смешивание начинается с нее (или с первой записи)
+    last = np.maximum.accumulate(np.where(first | (alpha == 255), idx, 0))
+    ends = np.append(np.flatnonzero(first)[1:], n) - 1
+    base = last[ends]
+    acc_a = alpha[base] / 255.0
+    acc_rgb = palette_rgb[color[base]].astype(np.float64)
+
+    rest = np.flatnonzero(idx > base[group])
+    if len(rest) == 0:
+        return base, acc_rgb, acc_a
+    g_rest = group[rest]
+    rank = rest - base[g_rest]
+    # Накопление по слоям: слой r - r-я запись над нижней видимой
+    for r in range(1, int(rank.max()) + 1):
+        layer = rank == r
+        sel, g = rest[layer], g_rest[layer]
+        a_new = alpha[sel] / 255.0
+        a_old = acc_a[g]
+        a_out = a_new + a_old * (1.0 - a_new)
+        w_new = np.divide(a_new, a_out, out=np.ones_like(a_out), where=a_out > 0)
+        acc_rgb[g] = palette_rgb[color[sel]] * w_new[:, None] + acc_rgb[g] * (1.0 - w_new)[:, None]
+        acc_a[g] = a_out
+    return base, acc_rgb, acc_a
+
+def blend_cells(keys, color, alpha, palette_rgb):
+    """
+    Смешивание записей, попавших в одну клетку. keys - номер клетки (int64),
+    записи в порядке рисования; color - номера в палитре, alpha - 0..255.
+    -> (keys, rgb, alpha) по одной на клетку: rgb и alpha (0.0..1.0) - float,
+    то есть результат еще можно положить "поверх" фона или старой картинки.
+    """
+    order, first = _groups(keys)
+    _, rgb, acc_a = _over(first, color[order], alpha[order], palette_rgb)
+    return keys[order][first], rgb, acc_a
+
+class TileLayer:
+    """
+    Пиксели в плитках 64 x 64: по клетке на запись, повторы уже смешаны.
+    """
+
+    def __init__(self, palette):
+        self.palette = palette
+        self.tiles = {}  # ключ плитки -> (cell, color, alpha)
+
+    def __len__(self):
+        return sum(len(t[0]) for t in self.tiles.values())
+
+    def nbytes(self):
+        return sum(a.nbytes for t in self.tiles.values() for a in t)
+
+    def add(self, xs, ys, color, alpha):
+        """
+        Запись пикселей в порядке рисования (color - uint16, alpha - uint8).
+        """
+        keys = _tile_keys(xs, ys)
+        cells = ((ys & TILE_MASK) << TILE_SHIFT | (xs & TILE_MASK)).astype(np.uint16)
+
+        # Старые записи затронутых плиток идут первыми - они "под" новыми
+        touched = np.unique(keys)
+        old = [(k, self.tiles.pop(k)) for k in touched.tolist() if k in self.tiles]
+        if old:
+            keys = np.concatenate([np.full(len(t[0]), k, dtype=np.int64) for k, t in old] + [keys])
+            cells = np.concatenate([t[0] for _, t in old] + [cells])
+            color = np.concatenate([t[1] for _, t in old] + [color])
+            alpha = np.concatenate([t[2] for _, t in old] + [alpha])
+
+        keys, cells, color, alpha = self._merge(keys, cells, color, alpha)
+
+        # Раскладка результата по плиткам
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+        starts = np.concatenate(([0], bounds)).tolist()
+        ends = np.concatenate((bounds, [len(keys)])).tolist()
+        for a, b in zip(starts, ends):
+            self.tiles[int(keys[a])] = (cells[a:b].copy(), color[a:b].copy(), alpha[a:b].copy())
+
+    def _merge(self, keys, cells, color, alpha):
+        """
+        Сортировка по (плитка, клетка) с сохранением порядка рисования и
+        смешивание повторов в каждой клетке по порядку.
+        """
+        # Номер клетки: плитки по (tx, ty) от наименьшей - тот же порядок,
+        # что у ключей, но влезает в int64 вместе с номером клетки в плитке
+        tx, ty = _unpack_key(keys)
+        tx -= tx.min()
+        ty -= ty.min()
+        order, first = _groups((tx * (int(ty.max()) + 1) + ty) << (2 * TILE_SHIFT) | cells)
+        keys, cells, color, alpha = keys[order], cells[order], color[order], alpha[order]
+        if first.all():
+            return keys, cells, color, alpha
+
+        base, acc_rgb, acc_a = _over(first, color, alpha, self.palette.rgb)
+        merged_rgb = np.rint(acc_rgb).astype(np.uint8)
+        merged_color = color[base]
+        # Цвет меняется только при смешивании разных цветов - только для них
+        # ищем (или добавляем) номер в палитре
+        changed = np.any(merged_rgb != self.palette.rgb[merged_color], axis=1)
+        if changed.any():
+            merged_color = merged_color.copy()
+            merged_color[changed] = self.palette.indices(merged_rgb[changed])
+        merged_alpha = np.rint(acc_a * 255).astype(np.uint8)
+        return keys[first], cells[first], merged_color, merged_alpha
+
+    def cells(self, x_min, x_max, y_min, y_max):
+        """
+        Клетки плиток, пересекающих прямоугольник: (xs, ys, color, alpha).
+        """
+        tx0, tx1 = x_min >> TILE_SHIFT, x_max >> TILE_SHIFT
+        ty0, ty1 = y_min >> TILE_SHIFT, y_max >> TILE_SHIFT
+        if (tx1 - tx0 + 1) * (ty1 - ty0 + 1) <= len(self.tiles):
+            keys = [_pack(tx, ty) for tx in range(tx0, tx1 + 1) for ty in range(ty0, ty1 + 1)]
+            keys = [k for k in keys if k in self.tiles]
+        else:
+            # Прямоугольник больше рисунка - проще перебрать сами плитки
+            keys = [k for k in self.tiles
+                    if tx0 <= _unpack_key(k)[0] <= tx1 and ty0 <= _unpack_key(k)[1] <= ty1]
+        if not keys:
+            return _EMPTY
+
+        tiles = [self.tiles[k] for k in keys]
+        sizes = [len(t[0]) for t in tiles]
+        tx, ty = _unpack_key(np.repeat(np.array(keys, dtype=np.int64), sizes))
+        cells = np.concatenate([t[0] for t in tiles]).astype(np.int64)
+        xs = tx << TILE_SHIFT | (cells & TILE_MASK)
+        ys = ty << TILE_SHIFT | (cells >> TILE_SHIFT)
+        color = np.concatenate([t[1] for t in tiles])
+        alpha = np.concatenate([t[2] for t in tiles])
+        return xs, ys, color, alpha
+
+class SpanLayer:
+    """
+    Спаны в порядке рисования: по записи на строку фигуры. Запись - (y,
+    x_start, x_end), а у вертикальной (серии run_slice() по столбцу) -
+    (x, y_start, y_end).
+    """
+
+    def __init__(self):
+        self.parts = []  # (spans int32, vertical, color, alpha) по вызовам add
+
+    def _arrays(self):
+        if len(self.parts) > 1:
+            self.parts = [tuple(np.concatenate(a) for a in zip(*self.parts))]
+        return self.parts[0]
+
+    def __len__(self):
+        return sum(len(p[0]) for p in self.parts)
+
+    def nbytes(self):
+        return sum(a.nbytes for p in self.parts for a in p)
+
+    def add(self, spans, vertical, color, alpha):
+        self.parts.append((spans.astype(np.int32), vertical, color, alpha))
+
+    def cells(self, x_min, x_max, y_min, y_max):
+        """
+        Клетки спанов внутри прямоугольника: (xs, ys, color, alpha).
+        """
+        spans, vertical, color, alpha = self._arrays()
+        # along - координата вдоль спана, across - его строка (столбец)
+        across = spans[:, 0].astype(np.int64)
+        along_min = np.where(vertical, y_min, x_min)
+        along_max = np.where(vertical, y_max, x_max)
+        across_min = np.where(vertical, x_min, y_min)
+        across_max = np.where(vertical, x_max, y_max)
+        a0 = np.maximum(spans[:, 1], along_min)
+        a1 = np.minimum(spans[:, 2], along_max)
+        keep = (across >= across_min) & (across <= across_max) & (a1 >= a0)
+        counts = (a1 - a0 + 1)[keep]
+        along = np.repeat(a0[keep], counts) + steps(counts)
+        across = np.repeat(across[keep], counts)
+        vert = np.repeat(vertical[keep], counts)
+        xs = np.where(vert, across, along)
+        ys = np.where(vert, along, across)
+        return xs, ys, np.repeat(color[keep], counts), np.repeat(alpha[keep], counts)
+
+_EMPTY = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+          np.empty(0, dtype=np.uint16), np.empty(0, dtype=np.uint8))
+
+def _alpha_bytes(alpha, n):
+    alpha = np.broadcast_to(np.asarray(alpha, dtype=np.float64), (n,))
+    return np.rint(np.clip(alpha, 0.0, 1.0) * 255).astype(np.uint8)
+
+class PixelStore:
+    def __init__(self):
+        self.palette = Palette()
+        self.layers = []  # TileLayer и SpanLayer в порядке рисования
+
+    def __len__(self):
+        return sum(len(layer) for layer in self.layers)
+
+    def nbytes(self):
+        return sum(layer.nbytes() for layer in self.layers)
+
+    def clear(self):
+        self.layers = []
+
+    def _tile_layer(self):
+        if not self.layers or not isinstance(self.layers[-1], TileLayer):
+            self.layers.append(TileLayer(self.palette))
+        return self.layers[-1]
+
+    def _span_layer(self):
+        if not self.layers or not isinstance(self.layers[-1], SpanLayer):
+            self.layers.append(SpanLayer())
+        return self.layers[-1]
+
+    def add(self, xs, ys, color, alpha=1.0):
+        """
+        Запись пикселей в порядке рисования. color - номер(а) цвета в палитре,
+        alpha - число или массив 0.0..1.0.
+        """
+        xs = np.asarray(xs, dtype=np.int64)
+        n = len(xs)
+        if n == 0:
+            return
+        ys = np.asarray(ys, dtype=np.int64)
+        color = np.broadcast_to(np.asarray(color, dtype=np.uint16), (n,))
+        self._tile_layer().add(xs, ys, color, _alpha_bytes(alpha, n))
+
+    def add_pixels(self, pixels):
+        """
+        Запись списка (x, y, color, alpha) - формат алгоритмов из algorithms.py.
+        """
+        n = len(pixels)
+        xs = np.fromiter((p[0] for p in pixels), dtype=np.int64, count=n)
+        ys = np.fromiter((p[1] for p in pixels), dtype=np.int64, count=n)
+        color = np.fromiter((self.palette.index(p[2]) for p in pixels), dtype=np.uint16, count=n)
+        alpha = np.fromiter((p[3] for p in pixels), dtype=np.float64, count=n)
+        self.add(xs, ys, color, alpha)
+
+    def add_spans(self, spans, color, alpha=1.0, vertical=False):
+        """
+        Запись спанов (N, 3): строки (y, x_start, x_end), границы включительно;
+        vertical - серии по столбцам (x, y_start, y_end), как у run_slice()
+        (число или массив по записям).
+        color - номер(а) цвета в палитре, alpha - число или массив 0.0..1.0.
+        """
+        spans = np.asarray(spans, dtype=np.int64).reshape(-1, 3)
+        spans = spans[spans[:, 2] >= spans[:, 1]]
+        n = len(spans)
+        if n == 0:
+            return
+        color = np.array(np.broadcast_to(np.asarray(color, dtype=np.uint16), (n,)))
+        vertical = np.array(np.broadcast_to(np.asarray(vertical, dtype=bool), (n,)))
+        self._span_layer().add(spans, vertical, color, _alpha_bytes(alpha, n))
+
+    def query(self, x_min, x_max, y_min, y_max):
+        """
+        Пиксели, попадающие в прямоугольник клеток (границы включительно;
+        плитки отдаются целиком): (xs, ys, rgb), цвет уже наложен на белый фон.
+        """
+        parts = [layer.cells(x_min, x_max, y_min, y_max) for layer in self.layers]
+        kinds = [type(layer) for layer, part in zip(self.layers, parts) if len(part[0])]
+        parts = [part for part in parts if len(part[0])]
+        if not parts:
+            return _EMPTY[0], _EMPTY[1], np.empty((0, 3), dtype=np.uint8)
+        xs, ys, color, alpha = (np.concatenate(a) for a in zip(*parts))
+
+        # Повторы клеток надо смешивать, если слоев несколько или спаны
+        # перекрываются. Непрозрачные повторы смешивать не нужно: render()
+        # рисует по порядку, последний сверху
+        if (alpha == 255).all():
+            return xs, ys, self.palette.rgb[color]
+        if kinds == [TileLayer]:
+            alpha = alpha.astype(np.uint16)[:, None]
+            # "Поверх" белого фона в целых: (c * a + фон * (255 - a)) / 255
+            rgb = (self.palette.rgb[color] * alpha + np.array(BACKGROUND) * (255 - alpha) + 127) // 255
+            return xs, ys, rgb.astype(np.uint8)
+
+        x0, y0 = xs.min(), ys.min()
+        width = int(xs.max() - x0) + 1
+        keys, acc_rgb, acc_a = blend_cells((ys - y0) * width + (xs - x0), color, alpha, self.palette.rgb)
+        xs, ys = keys % width + x0, keys // width + y0
+        rgb = acc_rgb * acc_a[:, None] + np.array(BACKGROUND) * (1.0 - acc_a)[:, None]
+        return xs, ys, np.rint(rgb).astype(np.uint8)
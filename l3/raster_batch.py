@@ -0,0 +1,340 @@
+"""
+Пакетная растеризация отрезков на NumPy.
+
+Вход - массив концов отрезков (N, 4): строки (x1, y1, x2, y2), целые.
+Выход - (xs, ys, offsets): координаты всех пикселей подряд (int32) и
+границы отрезков (int64, длина N + 1). Пиксели отрезка i:
+
+    xs[offsets[i]:offsets[i + 1]], ys[offsets[i]:offsets[i + 1]]
+
+Порядок пикселей внутри отрезка и сами пиксели совпадают с пошаговыми
+версиями из algorithms.py (step_by_step, dda, bresenham, castle_pitteway;
+для wu_lines и bresenham_circles - wu и bresenham_circle) - они служат
+эталоном в тестах и в замере скорости:
+
+    python -m pytest test_raster_batch.py
+    python raster_batch.py
+
+Брезенхем и Кастл-Питвей считаются в замкнутой форме: i-й пиксель по
+ведущей оси смещен на i, по второй оси - на
+    Брезенхем:      (2*i*d_min + d_max - 1) // (2*d_max)
+    Кастл-Питвей:   (2*i*d_min + d_max) // (2*d_max)
+(решающая функция обоих алгоритмов - та же дробь, отличается только
+выбор при равенстве). ЦДА накапливает шаг последовательным сложением
+(np.cumsum по строке), чтобы ошибки округления были те же, что в цикле.
+"""
+import time
+
+import numpy as np
+
+# Пикселей в одной порции: временные массивы порции остаются в кэше
+# процессора, а не выделяются заново на весь результат
+CHUNK_PIXELS = 1 << 16
+
+def _as_segments(segments):
+    seg = np.asarray(segments, dtype=np.int64)
+    if seg.ndim != 2 or seg.shape[1] != 4:
+        raise ValueError("Ожидается массив отрезков формы (N, 4)")
+    return seg
+
+def _offsets(counts):
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+def _chunks(offsets):
+    """
+    Диапазоны отрезков [a, b) примерно по CHUNK_PIXELS пикселей
+    (длинный отрезок - отдельной порцией).
+    """
+    n = len(offsets) - 1
+    a = 0
+    while a < n:
+        b = int(np.searchsorted(offsets, offsets[a] + CHUNK_PIXELS, side="right")) - 1
+        b = max(b, a + 1)
+        yield a, b
+        a = b
+
+def steps(counts):
+    """
+    Номера элементов внутри своих групп подряд: группы длиной counts
+    (целые >= 0) -> 0, 1, ..., counts[0] - 1, 0, 1, ..., counts[1] - 1, ...
+    (int64, длина counts.sum()). Например, номер пикселя внутри своего
+    отрезка; пишется вместе с np.repeat(значение_группы, counts). Общий
+    помощник пакетных модулей (fill.py, pixel_store.py, parallel.py).
+    """
+    starts = np.cumsum(counts) - counts
+    step = np.arange(int(counts.sum()), dtype=np.int64)
+    step -= np.repeat(starts, counts)
+    return step
+
+def _rasterize(segments, counts_of, chunk_func):
+    """
+    Общий цикл по порциям: counts_of(seg) - число пикселей каждого отрезка,
+    chunk_func(seg, counts, xs, ys) заполняет пиксели порции.
+    """
+    seg = _as_segments(segments)
+    counts = counts_of(seg)
+    offsets = _offsets(counts)
+    xs = np.empty(offsets[-1], dtype=np.int32)
+    ys = np.empty(offsets[-1], dtype=np.int32)
+    for a, b in _chunks(offsets):
+        p, q = offsets[a], offsets[b]
+        chunk_func(seg[a:b], counts[a:b], xs[p:q], ys[p:q])
+    return xs, ys, offsets
+
+def _major_counts(seg):
+    x1, y1, x2, y2 = seg.T
+    return np.maximum(np.abs(x2 - x1), np.abs(y2 - y1)) + 1
+
+def _midpoint_chunk(seg, counts, xs, ys, bias):
+    x1, y1, x2, y2 = seg.T
+    dx, dy = np.abs(x2 - x1), np.abs(y2 - y1)
+    i = steps(counts)
+
+    # Смещение по второй оси: (2*i*d_min + major + bias) // (2*major)
+    major = np.maximum(counts - 1, 1)  # d_max = 0 - одна точка, сдвиг 0
+    minor = np.repeat(2 * np.minimum(dx, dy), counts)
+    minor *= i
+    minor += np.repeat(major + bias, counts)
+    minor //= np.repeat(2 * major, counts)
+
+    # Ведущая ось: начало + знак * i, вторая: начало + знак * minor
+    x_major = dx >= dy
+    sx = np.where(x2 > x1, 1, -1)
+    sy = np.where(y2 > y1, 1, -1)
+    along = i
+    along *= np.repeat(np.where(x_major, sx, sy), counts)
+    along += np.repeat(np.where(x_major, x1, y1), counts)
+    minor *= np.repeat(np.where(x_major, sy, sx), counts)
+    minor += np.repeat(np.where(x_major, y1, x1), counts)
+    # Внутри отрезка выбор одинаковый - ветвление хорошо предсказывается
+    pick = np.repeat(x_major, counts)
+    np.copyto(xs, np.where(pick, along, minor), casting="unsafe")
+    np.copyto(ys, np.where(pick, minor, along), casting="unsafe")
+
+def bresenham_lines(segments):
+    return _rasterize(segments, _major_counts,
+                      lambda *args: _midpoint_chunk(*args, bias=-1))
+
+def castle_lines(segments):
+    return _rasterize(segments, _major_counts,
+                      lambda *args: _midpoint_chunk(*args, bias=0))
+
+def _step_counts(seg):
+    x1, y1, x2, y2 = seg.T
+    return np.where(x1 == x2, np.abs(y2 - y1), np.abs(x2 - x1)) + 1
+
+def _step_chunk(seg, counts, xs, ys):
+    x1, y1, x2, y2 = seg.T
+    vertical = x1 == x2
+    i = steps(counts)
+
+    # x идет от меньшего конца (у вертикального отрезка стоит на месте)
+    x = np.repeat(~vertical, counts).astype(np.int64)
+    x *= i
+    x += np.repeat(np.where(vertical, x1, np.minimum(x1, x2)), counts)
+    xs[:] = x
+    # y = round(k*x + b) - в том же порядке операций, что в algorithms.py
+    # (b зависит от первого конца); у вертикального k = 0, b = min(y) + i
+    run = np.where(vertical, 1, x2 - x1)
+    k = np.where(vertical, 0.0, (y2 - y1) / run)
+    b = np.where(vertical, np.minimum(y1, y2), y1 - k * x1)
+    y = np.repeat(k, counts)
+    y *= x
+    y += np.repeat(b, counts)
+    vert = np.repeat(vertical, counts)
+    y[vert] += i[vert]
+    np.rint(y, out=y)
+    ys[:] = y
+
+def step_lines(segments):
+    """
+    Пошаговый алгоритм: y = round(k*x + b) для x от меньшего конца к большему
+    (вертикальный отрезок - по y снизу вверх).
+    """
+    return _rasterize(segments, _step_counts, _step_chunk)
+
+def dda_lines(segments):
+    """
+    ЦДА. Координаты - накопленная сумма шага: строка матрицы [начало, шаг,
+    шаг, ...], np.cumsum по строке складывает последовательно, как цикл в
+    algorithms.py. Отрезки обрабатываются в порядке длины (в матрице порции мало
+    лишних ячеек), пиксели раскладываются на свои места в результате.
+    """
+    seg = _as_segments(segments)
+    counts = _major_counts(seg)
+    offsets = _offsets(counts)
+    xs = np.empty(offsets[-1], dtype=np.int32)
+    ys = np.empty(offsets[-1], dtype=np.int32)
+
+    order = np.argsort(counts, kind="stable")
+    for a, b in _chunks(_offsets(counts[order])):
+        idx = order[a:b]
+        x1, y1, x2, y2 = seg[idx].T
+        cnt = counts[idx]
+        length = np.maximum(cnt - 1, 1)
+        width = int(cnt[-1])  # самый длинный в порции - последний
+        mask = np.arange(width) < cnt[:, None]
+        dest = np.repeat(offsets[idx], cnt)
+        dest += steps(cnt)
+        for out, start, end in ((xs, x1, x2), (ys, y1, y2)):
+            acc = np.empty((len(idx), width), dtype=np.float64)
+            acc[:, 0] = start
+            acc[:, 1:] = ((end - start) / length)[:, None]
+            np.cumsum(acc, axis=1, out=acc)
+            out[dest] = np.rint(acc[mask])
+    return xs, ys, offsets
+
+def bresenham_circles(circles):
+    """
+    Окружности Брезенхема: вход (N, 3) - строки (xc, yc, r). Все окружности
+    идут шагами одновременно (цикл по x, векторный по окружностям; каждая
+    выбывает, когда y < x). Пиксели и их порядок - как у
+    algorithms.bresenham_circle(): по 8 точек на шаг, с теми же повторами.
+    """
+    c = np.asarray(circles, dtype=np.int64)
+    if c.ndim != 2 or c.shape[1] != 3:
+        raise ValueError("Ожидается массив окружностей формы (N, 3)")
+    n = len(c)
+    xc, yc, r = c[:, 0], c[:, 1], np.abs(c[:, 2])
+
+    # Шаги: (номера окружностей, x, y) - начальный и после каждого сдвига
+    octant_steps = [(np.arange(n), np.zeros(n, dtype=np.int64), r.copy())]
+    idx, x, y, d = np.arange(n), np.zeros(n, dtype=np.int64), r.copy(), 3 - 2 * r
+    while True:
+        active = y >= x
+        idx, x, y, d = idx[active], x[active], y[active], d[active]
+        if len(idx) == 0:
+            break
+        x = x + 1
+        up = d > 0
+        y = y - up
+        d = np.where(up, d + 4 * (x - y) + 10, d + 4 * x + 6)
+        octant_steps.append((idx, x, y))
+
+    counts = np.zeros(n, dtype=np.int64)
+    for step_idx, _, _ in octant_steps:
+        counts[step_idx] += 8
+    offsets = _offsets(counts)
+    xs = np.empty(offsets[-1], dtype=np.int32)
+    ys = np.empty(offsets[-1], dtype=np.int32)
+    for k, (step_idx, sx, sy) in enumerate(octant_steps):
+        base = offsets[step_idx] + 8 * k
+        cx, cy = xc[step_idx], yc[step_idx]
+        # Порядок октантов - как в add_octants()
+        for j, (px, py) in enumerate(((cx + sx, cy + sy), (cx - sx, cy + sy),
+                                      (cx + sx, cy - sy), (cx - sx, cy - sy),
+                                      (cx + sy, cy + sx), (cx - sy, cy + sx),
+                                      (cx + sy, cy - sx), (cx - sy, cy - sx))):
+            xs[base + j] = px
+            ys[base + j] = py
+    return xs, ys, offsets
+
+def wu_lines(segments):
+    """
+    Сглаженные отрезки Ву -> (xs, ys, alpha, offsets). Пиксели, прозрачности
+    и порядок - как у algorithms.wu(): пары пикселей концов, затем пары
+    основного цикла. Концы целые, поэтому у них прозрачность 0.5 и 0.0;
+    пересечение основного цикла накапливается np.cumsum, как в цикле.
+    """
+    seg = _as_segments(segments)
+    x1, y1, x2, y2 = seg.T
+    steep = np.abs(y2 - y1) > np.abs(x2 - x1)
+    # Крутые отрезки - с переставленными осями, ведущая ось по возрастанию
+    a1, b1 = np.where(steep, y1, x1), np.where(steep, x1, y1)
+    a2, b2 = np.where(steep, y2, x2), np.where(steep, x2, y2)
+    flip = a1 > a2
+    a1, a2 = np.where(flip, a2, a1), np.where(flip, a1, a2)
+    b1, b2 = np.where(flip, b2, b1), np.where(flip, b1, b2)
+    dx = a2 - a1
+    gradient = np.where(dx == 0, 1.0, (b2 - b1) / np.maximum(dx, 1))
+
+    main = np.maximum(dx - 1, 0)  # шагов основного цикла
+    counts = 4 + 2 * main
+    offsets = _offsets(counts)
+    xs = np.empty(offsets[-1], dtype=np.int32)
+    ys = np.empty(offsets[-1], dtype=np.int32)
+    alpha = np.empty(offsets[-1], dtype=np.float64)
+
+    # Концы: (a1, b1) 0.5, (a1, b1 + 1) 0.0, (a2, b2) 0.5, (a2, b2 + 1) 0.0
+    start = offsets[:-1]
+    for j, (a, b, value) in enumerate(((a1, b1, 0.5), (a1, b1 + 1, 0.0),
+                                       (a2, b2, 0.5), (a2, b2 + 1, 0.0))):
+        xs[start + j] = np.where(steep, b, a)
+        ys[start + j] = np.where(steep, a, b)
+        alpha[start + j] = value
+
+    # Основной цикл порциями, отрезки по возрастанию длины (как в dda_lines)
+    order = np.argsort(main, kind="stable")
+    order = order[main[order] > 0]
+    for a, b in _chunks(_offsets(2 * main[order])):
+        idx = order[a:b]
+        cnt = main[idx]
+        width = int(cnt[-1])
+        mask = np.arange(width) < cnt[:, None]
+        acc = np.empty((len(idx), width), dtype=np.float64)
+        acc[:, 0] = b1[idx] + gradient[idx]
+        acc[:, 1:] = gradient[idx][:, None]
+        np.cumsum(acc, axis=1, out=acc)
+        intery = acc[mask]
+        ipart = np.floor(intery)
+        fpart = intery - ipart
+        along = np.repeat(a1[idx] + 1, cnt) + steps(cnt)
+        st = np.repeat(steep[idx], cnt)
+        # Нижний пиксель пары - на четных местах, верхний - на нечетных
+        dest = np.repeat(offsets[idx] + 4, cnt) + 2 * steps(cnt)
+        lower = ipart.astype(np.int64)
+        for k, across, value in ((0, lower, 1 - fpart), (1, lower + 1, fpart)):
+            xs[dest + k] = np.where(st, across, along)
+            ys[dest + k] = np.where(st, along, across)
+            alpha[dest + k] = np.clip(value, 0.0, 1.0)
+    return xs, ys, alpha, offsets
+
+ALGORITHMS = {
+    "step": step_lines,
+    "dda": dda_lines,
+    "bresenham": bresenham_lines,
+    "castle": castle_lines,
+}
+
+def rasterize_lines(segments, algorithm="bresenham"):
+    """
+    Растеризация набора отрезков выбранным алгоритмом -> (xs, ys, offsets).
+    """
+    try:
+        func = ALGORITHMS[algorithm]
+    except KeyError:
+        raise ValueError(f"Неизвестный алгоритм: {algorithm}") from None
+    return func(segments)
+
+def segment_pixels(xs, ys, offsets, i):
+    """
+    Пиксели отрезка i в виде списка (x, y) - для сравнения с algorithms.py.
+    """
+    a, b = offsets[i], offsets[i + 1]
+    return list(zip(xs[a:b].tolist(), ys[a:b].tolist()))
+
+# --- Замер скорости ---
+
+def _benchmark(count=2000, sample=200, seed=0):
+    """
+    Время пакетных версий на count длинных отрезках и оценка времени
+    пошаговых версий из algorithms.py на них же (по первым sample отрезкам).
+    """
+    import algorithms
+
+    segments = np.random.default_rng(seed).integers(-500, 501, size=(count, 4))
+    for name, func in ALGORITHMS.items():
+        t0 = time.perf_counter()
+        xs, _, _ = func(segments)
+        t_batch = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for s in segments[:sample]:
+            algorithms.ALGORITHMS[name](*map(int, s))
+        t_loop = (time.perf_counter() - t0) * count / sample
+        print(f"{name:<10} пикселей: {len(xs)}, пакетно: {t_batch * 1e3:.1f} мс, "
+              f"по одному (оценка): {t_loop * 1e3:.0f} мс, ускорение x{t_loop / t_batch:.0f}")
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,361 @@
+"""
+Сцены: файлы с множеством фигур, пакетная растеризация и вывод без окна.
+
+Текстовый формат - одна фигура на строку, строка с # в начале - комментарий:
+
+    # алгоритм  x1 y1 x2 y2  [цвет]
+    bresenham   -5 -3 8 5
+    wu          0 0 40 13  #ff0000
+    # окружность: центр и радиус
+    circle      0 0 25
+
+Алгоритмы: step, dda, bresenham, castle, runslice, wu, circle (цвет - как
+в Tk, по умолчанию черный). Двоичный формат (расширение .l3b) - заголовок
+MAGIC и записи RECORD по 20 байт подряд до конца файла; читается прямо в
+массив NumPy без разбора строк.
+
+Оба формата читаются потоково, порциями по CHUNK_RECORDS фигур: порция
+растеризуется пакетными версиями из raster_batch.py (по алгоритмам сразу),
+пиксели идут в исходном порядке фигур. Окно складывает их в PixelStore
+(draw_scene), а без окна они сразу накладываются на картинку
+(render_scene), которая сохраняется в PNG или PBM:
+
+    python scene.py scene.txt -o scene.png
+    python scene.py scene.txt --convert scene.l3b
+    python scene.py --random 300000 --convert big.l3b
+    python scene.py big.l3b -o big.pbm
+    python scene.py big.l3b -o big.png --jobs 0
+
+С --jobs картинка рисуется плитками в пуле процессов (parallel.py).
+"""
+import argparse
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from framebuffer import BACKGROUND, last_per_cell, parse_color
+from pixel_store import Palette, blend_cells
+from raster_batch import bresenham_circles, rasterize_lines, wu_lines
+
+ALGOS = ("step", "dda", "bresenham", "castle", "runslice", "wu", "circle")
+_CODES = {name: code for code, name in enumerate(ALGOS)}
+
+MAGIC = b"L3SCENE\x01"
+RECORD = np.dtype([("algo", "u1"), ("rgb", "u1", 3),
+                   ("x1", "<i4"), ("y1", "<i4"), ("x2", "<i4"), ("y2", "<i4")])
+BINARY_SUFFIX = ".l3b"
+# Фигур в порции: пиксели порции помещаются в несколько десятков МБ
+CHUNK_RECORDS = 1 << 14
+# Пикселей в одной записи в PixelStore: запись пересобирает затронутые
+# плитки, поэтому мелкие порции сначала объединяются
+STORE_PIXELS = 1 << 22
+
+def _text_chunks(lines, chunk):
+    colors = {}
+    rows = []
+    for lineno, line in enumerate(lines, 1):
+        fields = line.split()
+        if not fields or fields[0].startswith("#"):
+            continue
+        name = fields[0].lower()
+        if name not in _CODES:
+            raise ValueError(f"Строка {lineno}: неизвестный алгоритм {fields[0]}")
+        need = 3 if name == "circle" else 4
+        if not need + 1 <= len(fields) <= need + 2:
+            raise ValueError(f"Строка {lineno}: ожидается {name}, {need} целых и необязательный цвет")
+        try:
+            values = [int(v) for v in fields[1:need + 1]]
+            color = fields[need + 1] if len(fields) > need + 1 else "black"
+            if color not in colors:
+                colors[color] = parse_color(color)
+        except ValueError as e:
+            raise ValueError(f"Строка {lineno}: {e}") from None
+        if need == 3:
+            values.append(0)
+        rows.append((_CODES[name], colors[color], *values))
+        if len(rows) == chunk:
+            yield np.array(rows, dtype=RECORD)
+            rows = []
+    if rows:
+        yield np.array(rows, dtype=RECORD)
+
+def _binary_chunks(f, chunk):
+    size = chunk * RECORD.itemsize
+    while True:
+        data = f.read(size)
+        if not data:
+            return
+        if len(data) % RECORD.itemsize:
+            raise ValueError("Двоичная сцена обрезана: неполная запись в конце файла")
+        records = np.frombuffer(data, dtype=RECORD)
+        if (records["algo"] >= len(ALGOS)).any():
+            raise ValueError("Двоичная сцена: неизвестный код алгоритма")
+        yield records
+
+def read_scene(path, chunk=CHUNK_RECORDS):
+    """
+    Фигуры сцены порциями - массивами RECORD (формат определяется по MAGIC).
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) == MAGIC:
+            yield from _binary_chunks(f, chunk)
+            return
+    with open(path, encoding="utf-8") as f:
+        yield from _text_chunks(f, chunk)
+
+def write_scene(path, chunks):
+    """
+    Запись порций фигур: двоичный формат, если путь оканчивается на .l3b.
+    """
+    if str(path).endswith(BINARY_SUFFIX):
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            for records in chunks:
+                f.write(np.ascontiguousarray(records, dtype=RECORD).tobytes())
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        for records in chunks:
+            lines = []
+            for algo, rgb, x1, y1, x2, y2 in records.tolist():
+                coords = (x1, y1, x2) if ALGOS[algo] == "circle" else (x1, y1, x2, y2)
+                line = ALGOS[algo] + " " + " ".join(map(str, coords))
+                if tuple(rgb) != (0, 0, 0):
+                    line += " #%02x%02x%02x" % tuple(rgb)
+                lines.append(line + "\n")
+            f.writelines(lines)
+
+def random_scene(count, seed=0, extent=2000, chunk=CHUNK_RECORDS):
+    """
+    Случайная сцена для замеров: отрезки всеми алгоритмами и окружности.
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, chunk):
+        n = min(chunk, count - start)
+        records = np.zeros(n, dtype=RECORD)
+        records["algo"] = rng.integers(0, len(ALGOS), size=n)
+        records["x1"], records["y1"] = rng.integers(-extent, extent, size=(2, n))
+        # Короткие отрезки и небольшие окружности, как в чертежах
+        records["x2"] = records["x1"] + rng.integers(-60, 61, size=n)
+        records["y2"] = records["y1"] + rng.integers(-60, 61, size=n)
+        circle = records["algo"] == _CODES["circle"]
+        records["x2"][circle] = rng.integers(1, 40, size=int(circle.sum()))
+        records["y2"][circle] = 0
+        yield records
+
+def rasterize(records):
+    """
+    Пиксели порции фигур в порядке рисования: (xs, ys, prim, alpha), prim -
+    номер фигуры в порции. Фигуры одного алгоритма считаются одним пакетом.
+    """
+    parts = []
+    codes = records["algo"]
+    for code in np.unique(codes).tolist():
+        sel = np.flatnonzero(codes == code)
+        rec = records[sel]
+        name = ALGOS[code]
+        alpha = None
+        if name == "circle":
+            xs, ys, offsets = bresenham_circles(np.column_stack([rec["x1"], rec["y1"], rec["x2"]]))
+        else:
+            segments = np.column_stack([rec["x1"], rec["y1"], rec["x2"], rec["y2"]])
+            if name == "wu":
+                xs, ys, alpha, offsets = wu_lines(segments)
+            else:
+                # Серии run-slice - те же пиксели, что у Брезенхема
+                xs, ys, offsets = rasterize_lines(segments, "bresenham" if name == "runslice" else name)
+        if alpha is None:
+            alpha = np.ones(len(xs), dtype=np.float64)
+        parts.append((xs, ys, np.repeat(sel, np.diff(offsets)), alpha))
+    if not parts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, np.empty(0, dtype=np.float64)
+    xs, ys, prim, alpha = (np.concatenate(a) for a in zip(*parts))
+    if len(parts) > 1:
+        # Исходный порядок фигур (внутри фигуры порядок пикселей сохраняется)
+        order = np.argsort(prim, kind="stable")
+        xs, ys, prim, alpha = xs[order], ys[order], prim[order], alpha[order]
+    return xs, ys, prim, alpha
+
+def draw_scene(chunks, store):
+    """
+    Растеризация порций фигур в хранилище (для окна). -> (фигур, пикселей).
+    """
+    primitives = pixels = 0
+    pending, pending_pixels = [], 0
+    for records in chunks:
+        xs, ys, prim, alpha = rasterize(records)
+        pending.append((xs, ys, store.palette.indices(records["rgb"])[prim], alpha))
+        pending_pixels += len(xs)
+        primitives += len(records)
+        pixels += len(xs)
+        if pending_pixels >= STORE_PIXELS:
+            store.add(*(np.concatenate(a) for a in zip(*pending)))
+            pending, pending_pixels = [], 0
+    if pending:
+        store.add(*(np.concatenate(a) for a in zip(*pending)))
+    return primitives, pixels
+
+def record_bounds(records):
+    """
+    Границы пикселей каждой фигуры: массивы (x_min, y_min, x_max, y_max)
+    включительно.
+    """
+    x1, y1 = records["x1"].astype(np.int64), records["y1"].astype(np.int64)
+    x2, y2 = records["x2"].astype(np.int64), records["y2"].astype(np.int64)
+    circle = records["algo"] == _CODES["circle"]
+    # Окружность радиуса 0 у Брезенхема задевает и клетки (xc ± 1, yc ± 1)
+    r = np.maximum(np.abs(x2), 1)
+    lo_x = np.where(circle, x1 - r, np.minimum(x1, x2))
+    hi_x = np.where(circle, x1 + r, np.maximum(x1, x2))
+    lo_y = np.where(circle, y1 - r, np.minimum(y1, y2))
+    hi_y = np.where(circle, y1 + r, np.maximum(y1, y2))
+    # Ву рисует пару пикселей: второй - на 1 дальше по второй оси
+    wu = records["algo"] == _CODES["wu"]
+    steep = np.abs(y2 - y1) > np.abs(x2 - x1)
+    hi_x += wu & steep
+    hi_y += wu & ~steep
+    return lo_x, lo_y, hi_x, hi_y
+
+def scene_bbox(records):
+    """
+    Границы пикселей всех фигур: (x_min, y_min, x_max, y_max) включительно.
+    """
+    lo_x, lo_y, hi_x, hi_y = record_bounds(records)
+    return int(lo_x.min()), int(lo_y.min()), int(hi_x.max()), int(hi_y.max())
+
+def composite(image, bbox, xs, ys, color, alpha, palette):
+    """
+    Пиксели порции (в порядке рисования, color - номера в palette, alpha -
+    0.0..1.0) поверх картинки image (H, W, 3) uint8, которая покрывает
+    bbox = (x_min, y_min, x_max, y_max) включительно (клетка = пиксель, y
+    вверх). -> число пикселей, попавших в картинку.
+    """
+    x_min, y_min, x_max, y_max = bbox
+    w = x_max - x_min + 1
+    flat_image = image.reshape(-1, 3)
+    inside = (xs >= x_min) & (xs <= x_max) & (ys >= y_min) & (ys <= y_max)
+    keys = (y_max - ys[inside].astype(np.int64)) * w + (xs[inside] - x_min)
+    color = color[inside]
+    alpha = np.rint(alpha[inside] * 255).astype(np.uint8)
+    if (alpha == 255).all():
+        # Непрозрачные пиксели: последний в клетке сверху
+        last = last_per_cell(keys)
+        flat_image[keys[last]] = palette.rgb[color[last]]
+        return len(keys)
+    # Смешивание по клеткам; для непрозрачной клетки результат тот же, что
+    # у записи последнего пикселя, поэтому выбор ветки на итог не влияет
+    cells, rgb, acc_a = blend_cells(keys, color, alpha, palette.rgb)
+    old = flat_image[cells]
+    flat_image[cells] = np.rint(rgb * acc_a[:, None] + old * (1.0 - acc_a)[:, None])
+    return len(keys)
+
+def render_scene(chunks, bbox=None):
+    """
+    Сцена -> картинка (H, W, 3) uint8 без окна и без хранилища: порции
+    растеризуются и сразу накладываются на картинку. bbox - (x_min, y_min,
+    x_max, y_max) включительно; без него порции сначала читаются целиком
+    (20 байт на фигуру), чтобы найти границы.
+    -> (картинка, фигур, пикселей в картинке).
+    """
+    if bbox is None:
+        chunks = [records for records in chunks if len(records)]
+        if not chunks:
+            return np.full((1, 1, 3), BACKGROUND, dtype=np.uint8), 0, 0
+        bounds = np.array([scene_bbox(records) for records in chunks])
+        bbox = (bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max())
+    bbox = tuple(int(v) for v in bbox)
+    x_min, y_min, x_max, y_max = bbox
+    image = np.empty((y_max - y_min + 1, x_max - x_min + 1, 3), dtype=np.uint8)
+    image[:] = BACKGROUND
+    palette = Palette()
+
+    primitives = pixels = 0
+    for records in chunks:
+        xs, ys, prim, alpha = rasterize(records)
+        primitives += len(records)
+        pixels += composite(image, bbox, xs, ys, palette.indices(records["rgb"])[prim], alpha, palette)
+    return image, primitives, pixels
+
+def _png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+def write_png(path, image, level=6):
+    """
+    RGB-картинка -> PNG (только zlib; строки сжимаются блоками).
+    """
+    h, w = image.shape[:2]
+    compressor = zlib.compressobj(level)
+    rows = max(1, (1 << 22) // (3 * w + 1))  # около 4 МБ несжатых строк за раз
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)))
+        for top in range(0, h, rows):
+            block = image[top:top + rows]
+            raw = np.zeros((len(block), 3 * w + 1), dtype=np.uint8)  # фильтр 0
+            raw[:, 1:] = block.reshape(len(block), -1)
+            data = compressor.compress(raw.tobytes())
+            if data:
+                f.write(_png_chunk(b"IDAT", data))
+        f.write(_png_chunk(b"IDAT", compressor.flush()))
+        f.write(_png_chunk(b"IEND", b""))
+
+def write_pbm(path, image):
+    """
+    Картинка -> двоичный PBM (P4): черный - яркость меньше половины.
+    """
+    h, w = image.shape[:2]
+    luma = image.astype(np.uint16) @ np.array([77, 150, 29], dtype=np.uint16)
+    bits = np.packbits(luma < 128 * 256, axis=1)
+    with open(path, "wb") as f:
+        f.write(b"P4\n%d %d\n" % (w, h))
+        f.write(bits.tobytes())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Растеризация сцены без окна")
+    parser.add_argument("scene", nargs="?", help="Файл сцены (текст или .l3b)")
+    parser.add_argument("-o", "--output", help="Картинка: .png или .pbm")
+    parser.add_argument("--convert", help="Записать сцену в другой файл (.l3b - двоичный)")
+    parser.add_argument("--random", type=int, help="Вместо файла - случайная сцена из N фигур")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bbox", type=int, nargs=4, metavar=("X0", "Y0", "X1", "Y1"),
+                        help="Область картинки (по умолчанию - весь рисунок)")
+    parser.add_argument("--level", type=int, default=6, help="Степень сжатия PNG (0-9)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Процессов для вывода плитками (parallel.py), 0 - по числу ядер")
+    args = parser.parse_args(argv)
+    if (args.scene is None) == (args.random is None):
+        parser.error("нужен файл сцены или --random N")
+
+    def chunks():
+        if args.random is not None:
+            return random_scene(args.random, args.seed)
+        return read_scene(args.scene)
+
+    if args.convert:
+        t0 = time.perf_counter()
+        write_scene(args.convert, chunks())
+        print(f"Сцена записана: {args.convert} ({time.perf_counter() - t0:.2f} с)")
+    if not args.output:
+        return 0
+
+    t0 = time.perf_counter()
+    if args.jobs == 1:
+        image, primitives, pixels = render_scene(chunks(), args.bbox)
+    else:
+        from parallel import render_scene_parallel
+        image, primitives, pixels = render_scene_parallel(chunks(), args.bbox, args.jobs or None)
+    t1 = time.perf_counter()
+    if args.output.endswith(".pbm"):
+        write_pbm(args.output, image)
+    else:
+        write_png(args.output, image, args.level)
+    t2 = time.perf_counter()
+    print(f"Фигур: {primitives}, пикселей: {pixels}, картинка {image.shape[1]}x{image.shape[0]}")
+    print(f"Чтение и растеризация: {t1 - t0:.2f} с, вывод: {t2 - t1:.2f} с")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Планировщик перерисовки окна.
+
+Обработчики событий (перетаскивание, колесо мыши, изменение размера) не
+рисуют сами, а вызывают request(): вид помечается измененным, и кадр
+рисуется не чаще раза за кадр дисплея (таймер Tk after). Сколько бы
+событий ни пришло за это время, перерисовка будет одна - по последнему
+состоянию вида.
+
+Кадр состоит из этапов по важности (в окне: сетка с подписями, затем
+нарисованные пиксели). Первый этап выполняется всегда. Следующий - только
+если по прошлым замерам он укладывается в бюджет кадра; иначе он
+откладывается, пока вид не перестанет меняться (settle_ms без новых
+событий). Во время быстрого перетаскивания видна сетка, а детали
+дорисовываются, как только движение остановится.
+"""
+import time
+
+class RenderScheduler:
+    def __init__(self, widget, stages, frame_ms=16, budget_ms=12, settle_ms=60):
+        """
+        widget - любой виджет Tk (нужны after/after_cancel), stages - функции
+        этапов кадра без аргументов, по порядку.
+        """
+        self.widget = widget
+        self.stages = stages
+        self.frame_ms = frame_ms
+        self.budget_ms = budget_ms
+        self.settle_ms = settle_ms
+        # Оценка длительности этапов, мс (скользящее среднее)
+        self.cost_ms = [0.0] * len(stages)
+        self.next_stage = len(stages)  # с какого этапа продолжать кадр
+        self.pending = None  # id таймера after
+        self.settling = False  # таймер ждет успокоения вида, а не кадра
+        self.last_frame = 0.0
+
+    def request(self):
+        """
+        Вид изменился: кадр будет нарисован заново с первого этапа.
+        """
+        self.next_stage = 0
+        if self.pending is not None:
+            if not self.settling:
+                return  # кадр уже запланирован - он и покажет изменение
+            self.widget.after_cancel(self.pending)
+        since_ms = (time.perf_counter() - self.last_frame) * 1000
+        self.pending = self.widget.after(max(0, round(self.frame_ms - since_ms)), self._frame)
+        self.settling = False
+
+    def _run_stage(self, stage):
+        t0 = time.perf_counter()
+        self.stages[stage]()
+        cost = (time.perf_counter() - t0) * 1000
+        old = self.cost_ms[stage]
+        self.cost_ms[stage] = cost if old == 0 else 0.7 * old + 0.3 * cost
+
+    def _frame(self):
+        self.pending = None
+        self.settling = False
+        start = time.perf_counter()
+        self.last_frame = start
+        first = self.next_stage
+        stage = first
+        while stage < len(self.stages):
+            elapsed = (time.perf_counter() - start) * 1000
+            if stage > first and elapsed + self.cost_ms[stage] > self.budget_ms:
+                break
+            self._run_stage(stage)
+            stage += 1
+        self.next_stage = stage
+        if stage < len(self.stages):
+            # Остаток кадра - когда вид успокоится; новый request() отменит
+            # ожидание, и следующий кадр начнется с первого этапа
+            self.pending = self.widget.after(self.settle_ms, self._frame)
+            self.settling = True
@@ -0,0 +1,90 @@
+"""
+Сравнение пакетной растеризации (raster_batch.py) с пошаговыми версиями из
+algorithms.py - пиксели и их порядок должны совпадать:
+
+    python -m pytest test_raster_batch.py
+"""
+import numpy as np
+import pytest
+
+import algorithms
+import raster_batch
+from raster_batch import (ALGORITHMS, bresenham_circles, rasterize_lines,
+                          segment_pixels, steps, wu_lines)
+
+def random_segments(count, seed, extent=40):
+    """
+    Короткие отрезки во всех октантах, включая вырожденные (точки),
+    диагональные, горизонтальные и вертикальные.
+    """
+    rng = np.random.default_rng(seed)
+    segments = rng.integers(-extent, extent + 1, size=(count, 4))
+    part = count // 10
+    segments[:part, 2:] = segments[:part, :2]
+    diag = rng.integers(-extent, extent + 1, size=part)
+    segments[part:2 * part, 2] = segments[part:2 * part, 0] + diag
+    segments[part:2 * part, 3] = segments[part:2 * part, 1] - diag
+    segments[2 * part:3 * part, 3] = segments[2 * part:3 * part, 1]
+    segments[3 * part:4 * part, 2] = segments[3 * part:4 * part, 0]
+    return segments
+
+def reference_pixels(name, rows):
+    return [[(p[0], p[1]) for p in algorithms.ALGORITHMS[name](*map(int, row))] for row in rows]
+
+def batch_pixels(xs, ys, offsets):
+    return [segment_pixels(xs, ys, offsets, i) for i in range(len(offsets) - 1)]
+
+@pytest.mark.parametrize("name", list(ALGORITHMS))
+def test_lines_match_loops(name):
+    segments = random_segments(3000, 0)
+    xs, ys, offsets = ALGORITHMS[name](segments)
+    assert xs.dtype == ys.dtype == np.int32
+    assert offsets.dtype == np.int64 and len(offsets) == len(segments) + 1
+    assert batch_pixels(xs, ys, offsets) == reference_pixels(name, segments)
+
+@pytest.mark.parametrize("name", list(ALGORITHMS))
+def test_lines_across_chunks(name, monkeypatch):
+    # Длинные отрезки и маленькие порции: отрезки длиннее порции и
+    # границы порций посреди набора
+    segments = random_segments(300, 1, extent=500)
+    expected = reference_pixels(name, segments)
+    monkeypatch.setattr(raster_batch, "CHUNK_PIXELS", 100)
+    assert batch_pixels(*ALGORITHMS[name](segments)) == expected
+
+def test_wu_matches_loop(monkeypatch):
+    segments = random_segments(3000, 2)
+    monkeypatch.setattr(raster_batch, "CHUNK_PIXELS", 1000)
+    xs, ys, alpha, offsets = wu_lines(segments)
+    for i, row in enumerate(segments):
+        a, b = offsets[i], offsets[i + 1]
+        got = list(zip(xs[a:b].tolist(), ys[a:b].tolist(), alpha[a:b].tolist()))
+        assert got == [(p[0], p[1], p[3]) for p in algorithms.ALGORITHMS["wu"](*map(int, row))]
+
+def test_circles_match_loop():
+    rng = np.random.default_rng(3)
+    circles = np.column_stack([rng.integers(-40, 41, size=(2000, 2)),
+                               rng.integers(0, 60, size=2000)])
+    circles[:20, 2] = 0
+    assert batch_pixels(*bresenham_circles(circles)) == reference_pixels("circle", circles)
+
+def test_empty_input():
+    for func in ALGORITHMS.values():
+        xs, ys, offsets = func(np.empty((0, 4), dtype=np.int64))
+        assert len(xs) == len(ys) == 0 and offsets.tolist() == [0]
+    xs, ys, offsets = bresenham_circles(np.empty((0, 3), dtype=np.int64))
+    assert len(xs) == 0 and offsets.tolist() == [0]
+
+def test_rasterize_lines():
+    segments = random_segments(100, 4)
+    for name, func in ALGORITHMS.items():
+        for got, expected in zip(rasterize_lines(segments, name), func(segments)):
+            np.testing.assert_array_equal(got, expected)
+    with pytest.raises(ValueError):
+        rasterize_lines(segments, "wu")
+    with pytest.raises(ValueError):
+        rasterize_lines(np.zeros((3, 3)))
+
+def test_steps():
+    counts = np.array([3, 0, 1, 2])
+    assert steps(counts).tolist() == [0, 1, 2, 0, 0, 1]
+    assert steps(np.zeros(2, dtype=np.int64)).tolist() == []
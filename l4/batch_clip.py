@@ -0,0 +1,93 @@
+"""
+Пакетное отсечение отрезков прямоугольным окном на NumPy (Лианг-Барски).
+
+Вход - массив (N, 4) из строк (x1, y1, x2, y2) и окно [xmin, ymin, xmax,
+ymax] (как их возвращает read_data из lab.py). Выход - (clipped, accepted):
+clipped (N, 4) float - видимые части отрезков, accepted (N,) bool - есть
+ли у отрезка видимая часть; строки отброшенных отрезков заполнены NaN.
+
+Отрезок - P(t) = P1 + t * (P2 - P1), 0 <= t <= 1. Для каждой стороны окна
+условие видимости - p * t <= q:
+    слева   p = -dx, q = x1 - xmin
+    справа  p =  dx, q = xmax - x1
+    снизу   p = -dy, q = y1 - ymin
+    сверху  p =  dy, q = ymax - y1
+При p < 0 отрезок входит за сторону при t = q / p (t_enter - наибольшее из
+таких t и 0), при p > 0 - выходит (t_leave - наименьшее из таких t и 1);
+при p = 0 он параллелен стороне и виден, только если q >= 0. Отрезок
+принят, если t_enter <= t_leave. Все стороны считаются для всех отрезков
+сразу, без рекурсии и ветвлений по отрезкам.
+
+Края окна входят в окно, как в compute_code. Рекурсивный алгоритм средней
+точки (midpoint_clip_recursive из lab.py) остается эталоном: тесты
+сравнивают с ним концы видимых частей (он дробит отрезок до кусков меньше
+0.1, поэтому концы совпадают с точностью 0.1). Тесты и замер скорости:
+
+    python -m pytest test_batch_clip.py
+    python batch_clip.py
+"""
+import time
+
+import numpy as np
+
+# Отрезков в одной порции: временные массивы порции остаются в кэше
+# процессора, а не выделяются заново на весь набор
+CHUNK = 1 << 15
+
+def _clip_chunk(seg, xmin, ymin, xmax, ymax, out):
+    x1, y1, x2, y2 = seg.T
+    dx, dy = x2 - x1, y2 - y1
+    p = np.stack([-dx, dx, -dy, dy])
+    q = np.stack([x1 - xmin, xmax - x1, y1 - ymin, ymax - y1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = q / p
+    t_enter = np.max(np.where(p < 0, t, 0.0), axis=0)
+    t_leave = np.min(np.where(p > 0, t, 1.0), axis=0)
+    accepted = (t_enter <= t_leave) & ~np.any((p == 0) & (q < 0), axis=0)
+
+    # Неотсеченные концы - как есть; отсеченные лежат на стороне окна, и
+    # ошибка округления не выводит их наружу
+    out[:, 0] = np.clip(x1 + t_enter * dx, xmin, xmax)
+    out[:, 1] = np.clip(y1 + t_enter * dy, ymin, ymax)
+    out[:, 2] = np.clip(np.where(t_leave < 1, x1 + t_leave * dx, x2), xmin, xmax)
+    out[:, 3] = np.clip(np.where(t_leave < 1, y1 + t_leave * dy, y2), ymin, ymax)
+    out[~accepted] = np.nan
+    return accepted
+
+def clip_segments(segments, window):
+    """
+    Отсечение набора отрезков (N, 4) окном [xmin, ymin, xmax, ymax].
+    -> (clipped (N, 4) float, accepted (N,) bool).
+    """
+    segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+    xmin, ymin, xmax, ymax = (float(v) for v in window)
+    clipped = np.empty_like(segments)
+    accepted = np.empty(len(segments), dtype=bool)
+    for start in range(0, len(segments), CHUNK):
+        end = start + CHUNK
+        accepted[start:end] = _clip_chunk(segments[start:end], xmin, ymin, xmax, ymax, clipped[start:end])
+    return clipped, accepted
+
+# --- Замер скорости ---
+
+def _benchmark(count=1000000, sample=2000, seed=0):
+    """
+    Время clip_segments на count случайных отрезках и оценка времени
+    midpoint_clip_recursive на них же (по первым sample отрезкам).
+    """
+    from lab import midpoint_clip_recursive
+
+    window = [0.0, 0.0, 100.0, 60.0]
+    segments = np.random.default_rng(seed).uniform(-80, 180, size=(count, 4))
+    t0 = time.perf_counter()
+    clip_segments(segments, window)
+    t_batch = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for x1, y1, x2, y2 in segments[:sample].tolist():
+        midpoint_clip_recursive(x1, y1, x2, y2, *window, [])
+    t_loop = (time.perf_counter() - t0) * count / sample
+    print(f"отрезков: {count}, пакетно: {t_batch * 1e3:.1f} мс, "
+          f"средней точкой (оценка): {t_loop:.1f} с, ускорение x{t_loop / t_batch:.0f}")
+
+if __name__ == "__main__":
+    _benchmark()
@@ -1,5 +1,3 @@
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 import numpy as np
 
 # ==========================================
@@ -157,6 +155,10 @@ def cyrus_beck_clip(x1, y1, x2, y2, poly_points):
 # ==========================================
 
 def main():
+    # matplotlib нужен только для окна: алгоритмы импортируются и без него
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+
     # 1. Загрузка данных
     segments, window_rect = read_data('input.txt')
     if not segments:
@@ -0,0 +1,117 @@
+"""
+Сравнение clip_segments с рекурсивным алгоритмом средней точки
+(midpoint_clip_recursive из lab.py):
+
+    python -m pytest test_batch_clip.py
+
+Средняя точка дробит отрезок до кусков меньше 0.1, поэтому концы видимых
+частей сравниваются с точностью 0.1.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from batch_clip import clip_segments
+from lab import midpoint_clip_recursive, read_data
+
+WINDOW = [0.0, 0.0, 100.0, 60.0]
+TOLERANCE = 0.1
+
+def midpoint_reference(segments, window):
+    """
+    Концы видимой части по кускам midpoint_clip_recursive (самый ранний и
+    самый поздний по направлению отрезка). -> (clipped, accepted).
+    """
+    clipped = np.full((len(segments), 4), np.nan)
+    accepted = np.zeros(len(segments), dtype=bool)
+    for i, (x1, y1, x2, y2) in enumerate(segments.tolist()):
+        parts = []
+        midpoint_clip_recursive(x1, y1, x2, y2, *window, parts)
+        if not parts:
+            continue
+        points = np.array(parts).reshape(-1, 2)
+        t = (points[:, 0] - x1) * (x2 - x1) + (points[:, 1] - y1) * (y2 - y1)
+        clipped[i] = np.concatenate([points[t.argmin()], points[t.argmax()]])
+        accepted[i] = True
+    return clipped, accepted
+
+def assert_matches_midpoint(segments, window):
+    clipped, accepted = clip_segments(segments, window)
+    ref, ref_accepted = midpoint_reference(segments, window)
+    # Видимую часть короче 0.1 средняя точка может не найти
+    visible = np.hypot(clipped[:, 2] - clipped[:, 0], clipped[:, 3] - clipped[:, 1])
+    missed = accepted & ~ref_accepted & (visible < TOLERANCE)
+    assert not ((accepted != ref_accepted) & ~missed).any()
+    both = accepted & ref_accepted
+    assert np.abs(clipped[both] - ref[both]).max(initial=0.0) <= TOLERANCE + 1e-9
+    assert np.isnan(clipped[~accepted]).all()
+    assert not np.isnan(clipped[accepted]).any()
+
+def random_segments(count, seed):
+    return np.random.default_rng(seed).uniform(-80, 180, size=(count, 4))
+
+def test_random():
+    assert_matches_midpoint(random_segments(5000, 0), WINDOW)
+
+def test_degenerate():
+    segments = random_segments(2000, 1)
+    segments[:, 2:] = segments[:, :2]
+    assert_matches_midpoint(segments, WINDOW)
+
+@pytest.mark.parametrize("axis", [0, 1])
+def test_parallel_to_side(axis):
+    # axis 0 - вертикальные отрезки (x1 = x2), 1 - горизонтальные (y1 = y2)
+    segments = random_segments(2000, 2 + axis)
+    segments[:, 2 + axis] = segments[:, axis]
+    assert_matches_midpoint(segments, WINDOW)
+
+@pytest.mark.parametrize("axis, sides", [(0, (0.0, 100.0)), (1, (0.0, 60.0))])
+def test_on_edge(axis, sides):
+    # Отрезки, лежащие на прямых сторон окна: края входят в окно
+    rng = np.random.default_rng(4 + axis)
+    segments = random_segments(2000, 6 + axis)
+    segments[:, [axis, 2 + axis]] = rng.choice(sides, size=(len(segments), 1))
+    assert_matches_midpoint(segments, WINDOW)
+
+def test_exact_cases():
+    segments = np.array([
+        [-10, 30, 110, 30],   # поперек окна по горизонтали
+        [50, -5, 50, 70],     # поперек окна по вертикали
+        [0, 0, 100, 60],      # диагональ окна
+        [0, -10, 0, 70],      # по левой стороне
+        [20, 20, 20, 20],     # точка внутри
+        [120, 20, 120, 20],   # точка снаружи
+        [-10, 70, 10, 80],    # снаружи целиком
+        [100, 60, 120, 70],   # касается угла
+    ], dtype=float)
+    clipped, accepted = clip_segments(segments, WINDOW)
+    assert accepted.tolist() == [True, True, True, True, True, False, False, True]
+    np.testing.assert_allclose(clipped[accepted], [
+        [0, 30, 100, 30],
+        [50, 0, 50, 60],
+        [0, 0, 100, 60],
+        [0, 0, 0, 60],
+        [20, 20, 20, 20],
+        [100, 60, 100, 60],
+    ])
+
+def test_input_file():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "input.txt")
+    segments, window = read_data(path)
+    assert segments
+    assert_matches_midpoint(np.array(segments), window)
+
+def test_chunks():
+    # Наборы длиннее одной порции дают тот же результат, что по одному
+    import batch_clip
+
+    segments = random_segments(1000, 8)
+    whole = clip_segments(segments, WINDOW)
+    chunk, batch_clip.CHUNK = batch_clip.CHUNK, 7
+    try:
+        parts = clip_segments(segments, WINDOW)
+    finally:
+        batch_clip.CHUNK = chunk
+    np.testing.assert_array_equal(whole[0], parts[0])
+    np.testing.assert_array_equal(whole[1], parts[1])